@@ -68,12 +68,37 @@ calculate_cumulative_population <- function(city_code, city_name, target_year, d
   return(base_population + cumulative_migration)
 }
 
+MIGRATION_PANEL_FILE <- file.path("Data", "people_cleanedData", "migration_panel.csv")
+MIGRATION_PANEL <- if (file.exists(MIGRATION_PANEL_FILE)) {
+  read.csv(MIGRATION_PANEL_FILE, stringsAsFactors = FALSE, fileEncoding = "UTF-8-BOM",
+           colClasses = c(city = "character", district = "character", date = "character"))
+} else {
+  NULL
+}
+
+read_population_panel <- function(city_code, year, district = "全部") {
+  rows <- MIGRATION_PANEL[MIGRATION_PANEL$city == city_code &
+                          substr(MIGRATION_PANEL$date, 1, 3) == sprintf("%03d", as.numeric(year)), ]
+  if (district != "全部") {
+    rows <- rows[rows$district == district, ]
+  }
+  if (nrow(rows) == 0) return(NULL)
+  
+  rows <- rows[order(rows$date, rows$district), c("date", "population", "net_migration", "district")]
+  rownames(rows) <- NULL
+  return(rows)
+}
+
 read_population_data <- function(city_name, year, district = "全部") {
   if (is.null(city_name) || is.null(year)) return(NULL)
   
   city_code <- CITY_CODES[city_name]
   if (is.null(city_code)) return(NULL)
   
+  if (!is.null(MIGRATION_PANEL)) {
+    return(read_population_panel(city_code, year, district))
+  }
+  
   folder <- paste0(city_code, "_", city_name)
   init_file <- file.path("Data", "people_cleanedData", folder, paste0(city_code, "_init.csv"))
   migration_file <- file.path("Data", "people_cleanedData", folder, paste0(city_code, "_", year, ".csv"))
@@ -121,12 +146,39 @@ read_population_data <- function(city_name, year, district = "全部") {
   return(all_results)
 }
 
+PRICE_ROLLUP_FILE <- file.path("Data", "MergedHousePricingData", "price_rollup.csv")
+PRICE_ROLLUP <- if (file.exists(PRICE_ROLLUP_FILE)) {
+  read.csv(PRICE_ROLLUP_FILE, stringsAsFactors = FALSE, fileEncoding = "UTF-8-BOM",
+           colClasses = c(city = "character", district = "character", date = "character"))
+} else {
+  NULL
+}
+
+read_price_rollup <- function(city_code, year, district = "全部") {
+  rows <- PRICE_ROLLUP[PRICE_ROLLUP$city == city_code &
+                       substr(PRICE_ROLLUP$date, 1, 3) == sprintf("%03d", as.numeric(year)), ]
+  if (district != "全部") {
+    rows <- rows[rows$district == district, ]
+  }
+  
+  data.frame(date = rows$date,
+             鄉鎮市區_The.villages.and.towns.urban.district = rows$district,
+             price_per_sqm = rows$mean,
+             stringsAsFactors = FALSE)
+}
+
 read_house_price_data <- function(city_name, year, district = "全部") {
   if (is.null(city_name) || is.null(year)) return(NULL)
   
   city_code <- CITY_CODES[city_name]
   if (is.null(city_code)) return(NULL)
   
+  if (!is.null(PRICE_ROLLUP)) {
+    price_summary <- read_price_rollup(city_code, year, district)
+    if (nrow(price_summary) == 0) return(NULL)
+    return(fill_price_months(price_summary, year))
+  }
+  
   price_file_a <- file.path("Data", "MergedHousePricingData", as.character(year), paste0(city_code, "_lvr_land_a.csv"))
   price_file_b <- file.path("Data", "MergedHousePricingData", as.character(year), paste0(city_code, "_lvr_land_b.csv"))
   
@@ -159,6 +211,10 @@ read_house_price_data <- function(city_name, year, district = "全部") {
                            data = price_data, 
                            FUN = mean)
   
+  return(fill_price_months(price_summary, year))
+}
+
+fill_price_months <- function(price_summary, year) {
   all_months <- data.frame(
     date = sprintf("%03d%02d", as.numeric(year), 1:12)
   )
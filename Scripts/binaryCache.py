@@ -0,0 +1,197 @@
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import ingestData
+
+CACHE_DIR = "binary_cache"
+INDEX_FILE = "index.json"
+CACHE_VERSION = 1
+
+# 快取的欄位：名稱、對應的中文欄位與儲存型別；字典編碼的欄位以 -1 表示缺值
+COLUMNS = {
+    "district": ("鄉鎮市區", "dictionary"),
+    "building_type": ("建物型態", "dictionary"),
+    "date": ("交易年月日", "int32"),
+    "unit_price": ("單價元平方公尺", "float64"),
+    "total_price": ("總價元", "float64"),
+    "area": ("建物移轉總面積平方公尺", "float64"),
+}
+DICTIONARY_COLUMNS = [name for name, (_, kind) in COLUMNS.items() if kind == "dictionary"]
+
+def encode(series, dictionary):
+    """將類別欄位轉為全域字典中的代碼，新出現的值加入字典"""
+
+    categorical = pd.Categorical(series)
+    lookup = np.array([dictionary.setdefault(str(value), len(dictionary)) for value in categorical.categories],
+                      dtype=np.int64)
+    codes = categorical.codes.astype(np.int64)
+    return np.where(codes >= 0, lookup[np.maximum(codes, 0)] if len(lookup) else -1, -1)
+
+def roc_date(series):
+    """日期轉回民國年月日整數，無效的日期為 0"""
+
+    value = (series.dt.year - 1911) * 10000 + series.dt.month * 100 + series.dt.day
+    return value.fillna(0).astype(np.int32).to_numpy()
+
+def read_columns(path):
+    """只讀入快取需要的欄位，缺少的欄位以缺值補上"""
+
+    keys = [key for key, _ in COLUMNS.values()]
+    df = ingestData.read_lvr_csv(path, columns=keys)
+    found = {ingestData.column_key(c): c for c in df.columns}
+
+    data = {}
+    for name, (key, kind) in COLUMNS.items():
+        column = found.get(key)
+        if column is None:
+            data[name] = pd.Series([pd.NA] * len(df), dtype="object")
+        else:
+            data[name] = df[column]
+    return data, len(df)
+
+def list_merged_files(root):
+    """依年份與檔名排序列出合併後的實價登錄檔"""
+
+    root = Path(root)
+    files = []
+    for year_dir in sorted(d for d in root.iterdir() if d.is_dir() and d.name.isdigit()):
+        for path in sorted(year_dir.glob("*_lvr_land_*.csv")):
+            files.append((int(year_dir.name), path))
+    return files
+
+def build_cache(root=".", cache_dir=CACHE_DIR):
+    """由合併後的 CSV 建立每個欄位一個 .npy 檔的二進位快取，以及 (年份, 檔案) 的位移索引"""
+
+    root = Path(root)
+    dictionaries = {name: {} for name in DICTIONARY_COLUMNS}
+    parts = {name: [] for name in COLUMNS}
+    partitions = []
+    offset = 0
+
+    for year, path in list_merged_files(root):
+        try:
+            data, rows = read_columns(path)
+        except Exception as e:
+            print(f"  讀取 {path} 時發生錯誤: {e}")
+            continue
+
+        for name, (_, kind) in COLUMNS.items():
+            series = data[name]
+            if kind == "dictionary":
+                parts[name].append(encode(series, dictionaries[name]))
+            elif kind == "int32":
+                if pd.api.types.is_datetime64_any_dtype(series):
+                    parts[name].append(roc_date(series))
+                else:
+                    parts[name].append(np.zeros(rows, dtype=np.int32))
+            else:
+                parts[name].append(pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64))
+
+        city, kind = path.stem.split("_lvr_land_")
+        partitions.append({"year": year, "city": city, "kind": kind, "file": path.name,
+                           "start": offset, "stop": offset + rows})
+        offset += rows
+
+    output_dir = root / cache_dir
+    temp_dir = root / (cache_dir + ".tmp")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dir.mkdir()
+
+    dtypes = {}
+    for name, (_, kind) in COLUMNS.items():
+        if kind == "dictionary":
+            dtype = np.int16 if len(dictionaries[name]) < np.iinfo(np.int16).max else np.int32
+        else:
+            dtype = np.dtype(kind)
+        array = np.concatenate(parts[name]).astype(dtype) if parts[name] else np.empty(0, dtype=dtype)
+        np.save(temp_dir / f"{name}.npy", array)
+        dtypes[name] = np.dtype(dtype).name
+
+    index = {
+        "version": CACHE_VERSION,
+        "rows": offset,
+        "columns": dtypes,
+        "dictionaries": {name: list(values) for name, values in dictionaries.items()},
+        "partitions": partitions,
+    }
+    with open(temp_dir / INDEX_FILE, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(temp_dir, output_dir)
+    print(f"二進位快取完成，共 {offset} 筆，儲存至 {output_dir}")
+    return output_dir
+
+class BinaryCache:
+    """以 numpy memmap 開啟二進位快取，多個程序可共用同一份作業系統頁面快取"""
+
+    def __init__(self, path=CACHE_DIR):
+        self.path = Path(path)
+        with open(self.path / INDEX_FILE, encoding="utf-8") as f:
+            self.index = json.load(f)
+        if self.index.get("version") != CACHE_VERSION:
+            raise ValueError(f"{self.path} 的快取版本不符，請重新執行合併")
+        self.rows = self.index["rows"]
+        self.dictionaries = self.index["dictionaries"]
+        self.partitions = self.index["partitions"]
+        self.arrays = {}
+
+    def column(self, name):
+        """取得整個欄位的唯讀 memmap"""
+
+        if name not in self.arrays:
+            self.arrays[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self.arrays[name]
+
+    def slices(self, years=None, cities=None, kinds=None):
+        """符合條件的分區在欄位中的範圍"""
+
+        result = []
+        for part in self.partitions:
+            if years is not None and part["year"] not in years:
+                continue
+            if cities is not None and part["city"] not in cities:
+                continue
+            if kinds is not None and part["kind"] not in kinds:
+                continue
+            result.append(slice(part["start"], part["stop"]))
+        return result
+
+    def select(self, columns=None, years=None, cities=None, kinds=None):
+        """回傳各欄位在指定分區的陣列；只有單一分區時不複製資料"""
+
+        selected = self.slices(years, cities, kinds)
+        result = {}
+        for name in columns or COLUMNS:
+            array = self.column(name)
+            if len(selected) == 1:
+                result[name] = array[selected[0]]
+            elif selected:
+                result[name] = np.concatenate([array[s] for s in selected])
+            else:
+                result[name] = array[:0]
+        return result
+
+    def to_frame(self, columns=None, years=None, cities=None, kinds=None):
+        """轉為 DataFrame，字典編碼的欄位還原為 category"""
+
+        data = self.select(columns, years, cities, kinds)
+        frame = {}
+        for name, array in data.items():
+            if name in self.dictionaries:
+                frame[name] = pd.Categorical.from_codes(np.asarray(array, dtype=np.int32), self.dictionaries[name])
+            else:
+                frame[name] = array
+        return pd.DataFrame(frame)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="由合併後的實價登錄資料建立二進位快取")
+    parser.add_argument("--root", default=".", help="合併資料所在的資料夾（含各年份子資料夾）")
+    args = parser.parse_args()
+
+    build_cache(args.root)
@@ -0,0 +1,117 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import columnarStore
+import ingestData
+
+PANEL_FILE = "migration_panel.csv"
+PANEL_PARQUET_FILE = "migration_panel.parquet"
+PANEL_COLUMNS = ["city", "district", "date", "net_migration", "population"]
+
+TOTAL_ROW = "總計"
+MONTHS = np.arange(1, 13)
+
+def read_table(path):
+    """以文字讀入遷徙或人口表，第一欄為區域別"""
+
+    df = pd.read_csv(path, encoding=ingestData.sniff_encoding(path), dtype=str)
+    df = df.rename(columns={df.columns[0]: 'district'})
+    df['district'] = df['district'].str.strip()
+    df = df[df['district'].notna() & (df['district'] != '') & (df['district'] != TOTAL_ROW)]
+    # 與 R 端相同，同名的區域只取第一列
+    return df.drop_duplicates('district')
+
+def read_init(path):
+    """讀取各區的起始人口"""
+
+    df = read_table(path)
+    return pd.DataFrame({
+        'district': df['district'],
+        'base': ingestData.to_number(df.iloc[:, 1]),
+    }).dropna()
+
+def read_migration_year(path, year):
+    """將單一年份的 (區域 × 12 個月) 淨遷徙表轉為長表"""
+
+    df = read_table(path)
+    values = df.iloc[:, 1:13].apply(ingestData.to_number).fillna(0).to_numpy()
+    months = MONTHS[:values.shape[1]]
+    return pd.DataFrame({
+        'district': np.repeat(df['district'].to_numpy(), len(months)),
+        'date': np.tile(int(year) * 100 + months, len(df)),
+        'net_migration': values.ravel(),
+    })
+
+def build_city_panel(city_dir):
+    """建立單一縣市的長表，人口為起始人口加上逐月淨遷徙的累計"""
+
+    city = city_dir.name.split('_', 1)[0]
+    init_path = city_dir / f"{city}_init.csv"
+    if not init_path.exists():
+        return None
+
+    years = []
+    for path in sorted(city_dir.glob(f"{city}_*.csv")):
+        suffix = path.stem.split('_', 1)[1]
+        if suffix.isdigit():
+            years.append(read_migration_year(path, suffix))
+    if not years:
+        return None
+
+    panel = pd.concat(years, ignore_index=True).merge(read_init(init_path), on='district', how='inner')
+    panel = panel.sort_values(['district', 'date'], kind='stable')
+    panel['population'] = panel['base'] + panel.groupby('district', sort=False)['net_migration'].cumsum()
+    panel.insert(0, 'city', city)
+    return panel.drop(columns='base')
+
+def build_panel(root=".", output_file=PANEL_FILE, parquet=False):
+    """彙整所有縣市的遷徙資料，輸出 (縣市, 行政區, 年月, 淨遷徙, 人口) 長表"""
+
+    root = Path(root)
+    city_dirs = sorted(d for d in root.iterdir() if d.is_dir() and '_' in d.name)
+
+    panels = []
+    for city_dir in city_dirs:
+        try:
+            panel = build_city_panel(city_dir)
+        except Exception as e:
+            print(f"  處理 {city_dir} 時發生錯誤: {e}")
+            continue
+        if panel is not None:
+            panels.append(panel)
+
+    if panels:
+        panel = pd.concat(panels, ignore_index=True)
+        panel = panel.sort_values(['city', 'district', 'date'], kind='stable')
+        for column in ('net_migration', 'population'):
+            panel[column] = panel[column].round().astype('int64')
+        panel['date'] = panel['date'].map(lambda ym: f"{ym:05d}")
+    else:
+        panel = pd.DataFrame(columns=PANEL_COLUMNS)
+
+    panel = panel[PANEL_COLUMNS]
+    output_path = root / output_file
+    # queryService 與 RAPP 會直接讀取長表，先寫暫存檔再取代，讀取端不會看到寫到一半的檔案
+    temp_path = output_path.with_name(output_path.name + '.tmp')
+    panel.to_csv(temp_path, index=False, encoding='utf-8-sig')
+    os.replace(temp_path, output_path)
+    print(f"遷徙人口長表完成，共 {len(panel)} 筆，儲存至 {output_path}")
+
+    if parquet:
+        columnarStore.require_pyarrow()
+        parquet_path = root / PANEL_PARQUET_FILE
+        typed = panel.astype({'city': 'category', 'district': 'category'})
+        typed.to_parquet(parquet_path, index=False, compression='zstd')
+        print(f"另存為 {parquet_path}")
+    return panel
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="由各縣市的淨遷徙資料建立行政區每月人口長表")
+    parser.add_argument("--root", default=".", help="遷徙資料所在的資料夾（含各縣市子資料夾）")
+    parser.add_argument("--parquet", action="store_true", help="另外輸出 Parquet 檔（需要 pyarrow）")
+    args = parser.parse_args()
+
+    build_panel(args.root, parquet=args.parquet)
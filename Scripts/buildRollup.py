@@ -0,0 +1,88 @@
+import os
+import argparse
+import pandas as pd
+from pathlib import Path
+
+import ingestData
+
+ROLLUP_FILE = "price_rollup.csv"
+ROLLUP_COLUMNS = ["city", "district", "date", "count", "sum", "mean", "min", "max"]
+
+DISTRICT_KEY = "鄉鎮市區"
+PRICE_KEY = "單價元平方公尺"
+DATE_KEY = "交易年月日"
+
+def select_price_file(year_dir, city):
+    """與儀表板相同：優先使用 _a 檔，沒有時才使用 _b 檔"""
+
+    for kind in ("a", "b"):
+        path = Path(year_dir) / f"{city}_lvr_land_{kind}.csv"
+        if path.exists():
+            return path
+    return None
+
+def rollup_file(path, year, residential_only=False):
+    """計算單一合併檔中各行政區每月單價的筆數、總和、平均、最小與最大值"""
+
+    df = ingestData.read_lvr_csv(path, columns=[DISTRICT_KEY, PRICE_KEY, DATE_KEY], residential_only=residential_only)
+    columns = {ingestData.column_key(c): c for c in df.columns}
+    if len(columns) < 3:
+        return None
+
+    date = df[columns[DATE_KEY]]
+    data = pd.DataFrame({
+        'district': df[columns[DISTRICT_KEY]],
+        'date': (date.dt.year - 1911) * 100 + date.dt.month,
+        'price': df[columns[PRICE_KEY]],
+    }).dropna()
+    data = data[data['date'] // 100 == int(year)]
+    if data.empty:
+        return None
+
+    summary = data.groupby(['district', 'date'], observed=True)['price'].agg(['count', 'sum', 'mean', 'min', 'max']).reset_index()
+    summary['district'] = summary['district'].astype(str)
+    summary['date'] = summary['date'].astype(int).map(lambda ym: f"{ym:05d}")
+    return summary
+
+def build_rollup(root=".", output_file=ROLLUP_FILE, residential_only=False):
+    """彙整所有年份的合併檔，輸出 (縣市, 行政區, 年月) 的單價彙總表"""
+
+    root = Path(root)
+    year_dirs = sorted(d for d in root.iterdir() if d.is_dir() and d.name.isdigit())
+
+    summaries = []
+    for year_dir in year_dirs:
+        cities = sorted({f.split('_', 1)[0] for f in os.listdir(year_dir) if '_lvr_land_' in f})
+        for city in cities:
+            path = select_price_file(year_dir, city)
+            try:
+                summary = rollup_file(path, year_dir.name, residential_only)
+            except Exception as e:
+                print(f"  彙總 {path} 時發生錯誤: {e}")
+                continue
+            if summary is None:
+                continue
+            summary.insert(0, 'city', city)
+            summaries.append(summary)
+
+    if summaries:
+        rollup = pd.concat(summaries, ignore_index=True)
+        rollup = rollup.sort_values(['city', 'district', 'date'], kind='stable')
+    else:
+        rollup = pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    output_path = root / output_file
+    # queryService 與 RAPP 會直接讀取彙總表，先寫暫存檔再取代，讀取端不會看到寫到一半的檔案
+    temp_path = output_path.with_name(output_path.name + '.tmp')
+    rollup[ROLLUP_COLUMNS].to_csv(temp_path, index=False, encoding='utf-8-sig')
+    os.replace(temp_path, output_path)
+    print(f"單價彙總表完成，共 {len(rollup)} 筆，儲存至 {output_path}")
+    return rollup
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="由合併後的實價登錄資料建立行政區每月單價彙總表")
+    parser.add_argument("--root", default=".", help="合併資料所在的資料夾（含各年份子資料夾）")
+    parser.add_argument("--residential-only", action="store_true", help="只彙總住宅類建物型態的交易")
+    args = parser.parse_args()
+
+    build_rollup(args.root, residential_only=args.residential_only)
@@ -0,0 +1,7 @@
+city_code = {
+    "A": "臺北市", "B": "新北市", "C": "台中市", "D": "台南市", "E": "高雄市",
+    "F": "桃園市", "G": "新竹縣", "H": "苗栗縣", "I": "彰化縣", "J": "南投縣",
+    "K": "雲林縣", "L": "嘉義縣", "M": "屏東縣", "N": "宜蘭縣", "O": "花蓮縣",
+    "P": "台東縣", "Q": "基隆市", "R": "新竹市", "S": "嘉義市", "T": "澎湖縣",
+    "U": "金門縣", "V": "連江縣"
+}
@@ -0,0 +1,160 @@
+import pandas as pd
+from pathlib import Path
+
+import ingestData
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+PARQUET_ROOT = "parquet"
+ROW_GROUP_SIZE = 50_000
+
+NUMERIC_COLUMNS = {key for key, kind in ingestData.LVR_SCHEMA.items() if kind == ingestData.NUMBER}
+CATEGORY_COLUMNS = {key for key, kind in ingestData.LVR_SCHEMA.items() if kind == ingestData.CATEGORY}
+ROC_DATE_COLUMNS = {"交易年月日", "建築完成年月"}
+SORT_COLUMN = "交易年月日"
+
+def require_pyarrow():
+    """確認已安裝 pyarrow"""
+
+    if pa is None:
+        raise ImportError("輸出 Parquet 需要安裝 pyarrow: pip install pyarrow")
+
+column_key = ingestData.column_key
+find_column = ingestData.find_column
+to_number = ingestData.to_number
+
+def to_typed_frame(df):
+    """依欄位宣告將合併後的資料轉為具型別的欄位，未宣告的欄位一律為字串"""
+
+    typed = pd.DataFrame(index=df.index)
+    for column in df.columns:
+        key = column_key(column)
+        series = df[column]
+        if key in NUMERIC_COLUMNS:
+            typed[column] = to_number(series).astype("float64")
+        elif key in ROC_DATE_COLUMNS:
+            typed[column] = to_number(series).round().astype("Int32")
+        elif key in CATEGORY_COLUMNS:
+            typed[column] = series.astype("string").astype("category")
+        else:
+            typed[column] = series.astype("string")
+    return typed
+
+def arrow_type(column):
+    """欄位在 Parquet 中的型別；所有檔案使用同一套型別，資料集才能一起讀取"""
+
+    key = column_key(column)
+    if key in NUMERIC_COLUMNS:
+        return pa.float64()
+    if key in ROC_DATE_COLUMNS:
+        return pa.int32()
+    if key in CATEGORY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+def to_table(df):
+    """將合併後的資料轉為依日期排序、符合固定型別的 Arrow 表，讓 row group 的日期範圍集中"""
+
+    typed = to_typed_frame(df)
+    sort_column = find_column(typed.columns, SORT_COLUMN)
+    if sort_column is not None:
+        typed = typed.sort_values(sort_column, kind="stable")
+    schema = pa.schema([pa.field(column, arrow_type(column)) for column in typed.columns])
+    return pa.Table.from_pandas(typed, preserve_index=False).cast(schema)
+
+def partition_path(root, year, filename):
+    """回傳 year=/city= 分區下的輸出路徑"""
+
+    stem = Path(filename).stem
+    city = stem.split("_", 1)[0]
+    return Path(root) / f"year={year}" / f"city={city}" / f"{stem.split('_', 1)[1]}.parquet"
+
+def write_partition(df, root, year, filename):
+    """將合併後的資料寫入依年份與縣市代碼分區的 Parquet 資料集"""
+
+    require_pyarrow()
+
+    output_path = partition_path(root, year, filename)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    table = to_table(df)
+    pq.write_table(table, output_path, compression="zstd",
+                   row_group_size=ROW_GROUP_SIZE, write_statistics=True)
+    return output_path
+
+def read_dataset(root=PARQUET_ROOT, columns=None, years=None, cities=None, date_range=None):
+    """讀取 Parquet 資料集，只載入需要的欄位與分區
+
+    columns 可使用中文欄位名稱，date_range 為民國年月日整數的 (起, 迄)，
+    會透過各 row group 的統計值略過不符合的資料。
+    """
+
+    require_pyarrow()
+
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    # _a 與 _b 檔的欄位不同，以所有檔案欄位的聯集讀取
+    schema = pa.unify_schemas([dataset.schema] + [f.physical_schema for f in dataset.get_fragments()])
+    dataset = ds.dataset(root, schema=schema, format="parquet", partitioning="hive")
+    names = dataset.schema.names
+
+    selected = None
+    if columns is not None:
+        selected = [find_column(names, column_key(c)) or c for c in columns]
+
+    expression = None
+    conditions = []
+    if years is not None:
+        conditions.append(ds.field("year").isin([int(y) for y in years]))
+    if cities is not None:
+        conditions.append(ds.field("city").isin(list(cities)))
+    if date_range is not None:
+        date_column = find_column(names, SORT_COLUMN)
+        start, end = date_range
+        conditions.append((ds.field(date_column) >= start) & (ds.field(date_column) <= end))
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=selected, filter=expression)
+    return table.to_pandas()
+
+class PartitionWriter:
+    """逐塊寫入單一分區檔，供串流合併使用"""
+
+    def __init__(self, root, year, filename):
+        require_pyarrow()
+        self.output_path = partition_path(root, year, filename)
+        self.temp_path = self.output_path.with_name(self.output_path.name + ".tmp")
+        self.writer = None
+        self.schema = None
+
+    def write(self, df):
+        """將一個區塊依日期排序並轉為固定型別後寫入，每個區塊各自成為日期集中的 row group"""
+
+        table = to_table(df)
+        if self.writer is None:
+            self.schema = table.schema
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(self.temp_path, self.schema, compression="zstd", write_statistics=True)
+        self.writer.write_table(table.cast(self.schema), row_group_size=ROW_GROUP_SIZE)
+
+    def close(self):
+        """完成寫入並回傳輸出路徑"""
+
+        if self.writer is None:
+            return None
+        self.writer.close()
+        self.temp_path.replace(self.output_path)
+        return self.output_path
+
+    def abort(self):
+        """放棄寫到一半的檔案"""
+
+        if self.writer is not None:
+            self.writer.close()
+        if self.temp_path.exists():
+            self.temp_path.unlink()
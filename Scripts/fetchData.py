@@ -0,0 +1,165 @@
+import os
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+import aiohttp
+
+from cityCodes import city_code
+
+# 儀表板「淨遷徙人數」統計表背後的資料請求；實際端點請由瀏覽器開發者工具的網路面板確認後以 --endpoint 指定
+DEFAULT_PARAMS = {
+    "key": "E01",
+    "option": "0_3",
+    "county": "{city_name}",
+    "year": "{year}",
+    "month": "{month}",
+}
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+class RateLimiter:
+    """限制每秒送出的請求數"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def output_filename(code, year, month, extension=".csv"):
+    """與 getData.py 相同的檔名：{代碼}_{年}{月}"""
+
+    return f"{code}_{year:02d}{month:02d}{extension}"
+
+def build_tasks(output_dir, cities, start_year, end_year, extension=".csv"):
+    """列出所有 (縣市, 年, 月) 下載工作，已存在的檔案直接略過"""
+
+    tasks = []
+    for code in cities:
+        for year in range(start_year, end_year + 1):
+            for month in range(1, 13):
+                path = Path(output_dir) / output_filename(code, year, month, extension)
+                if not path.exists():
+                    tasks.append((code, city_code[code], year, month, path))
+    return tasks
+
+def check_body(body, content_type):
+    """確認回應是資料檔而非錯誤頁或登入頁，回傳錯誤訊息，正常時回傳 None"""
+
+    if not body.strip():
+        return "回應內容為空"
+    if "html" in (content_type or "").lower() or body.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+        return f"回應不是資料檔（Content-Type: {content_type}）"
+    return None
+
+def build_params(template, code, city_name, year, month):
+    """以縣市與年月填入請求參數"""
+
+    return {key: str(value).format(code=code, city_name=city_name, year=year, month=month)
+            for key, value in template.items()}
+
+async def fetch_one(session, endpoint, params, output_path, limiter, retries=4, backoff=1.0):
+    """下載單一檔案，遇到暫時性錯誤時以指數退避重試"""
+
+    for attempt in range(retries + 1):
+        await limiter.wait()
+        try:
+            async with session.get(endpoint, params=params) as response:
+                if response.status == 200:
+                    body = await response.read()
+                    # 伺服器忙碌或登入逾時時可能以 200 回傳 HTML 頁面，存成 .csv 後重跑也會被略過
+                    error = check_body(body, response.content_type)
+                    if error is None:
+                        temp_path = output_path.with_name(output_path.name + ".part")
+                        temp_path.write_bytes(body)
+                        os.replace(temp_path, output_path)
+                        return True, None
+                elif response.status in RETRY_STATUS:
+                    error = f"HTTP {response.status}"
+                else:
+                    return False, f"HTTP {response.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+    return False, error
+
+async def fetch_all(endpoint, tasks, params=None, concurrency=8, rate=4.0, retries=4, backoff=1.0, timeout=60):
+    """以有限的並行數與共用連線下載所有工作，回傳 (成功數, 失敗清單)"""
+
+    params = params or DEFAULT_PARAMS
+    limiter = RateLimiter(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    successful = 0
+    failures = []
+
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        async def run(task):
+            code, city_name, year, month, path = task
+            async with semaphore:
+                ok, error = await fetch_one(session, endpoint, build_params(params, code, city_name, year, month),
+                                            path, limiter, retries, backoff)
+            return task, ok, error
+
+        for done, future in enumerate(asyncio.as_completed([run(task) for task in tasks]), start=1):
+            (code, city_name, year, month, path), ok, error = await future
+            if ok:
+                successful += 1
+                print(f"  [{done}/{len(tasks)}] ✓ 成功下載: {path.name}")
+            else:
+                failures.append((code, year, month, error))
+                print(f"  [{done}/{len(tasks)}] ✗ {city_name} {year}年{month}月 下載失敗: {error}")
+
+    return successful, failures
+
+def parse_params(pairs):
+    """解析 --param key=value，覆寫預設的請求參數"""
+
+    params = dict(DEFAULT_PARAMS)
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        params[key] = value
+    return params
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="直接呼叫儀表板的資料請求，並行下載各縣市每月淨遷徙資料")
+    parser.add_argument("--endpoint", required=True, help="資料請求的網址（可指向本機測試伺服器）")
+    parser.add_argument("--param", action="append", help="請求參數 key=value，可使用 {code} {city_name} {year} {month}")
+    parser.add_argument("--output-dir", default="DownloadedData")
+    parser.add_argument("--cities", default="".join(city_code), help="要下載的縣市代碼，例如 ABF")
+    parser.add_argument("--start-year", type=int, default=103)
+    parser.add_argument("--end-year", type=int, default=113)
+    parser.add_argument("--extension", default=".csv")
+    parser.add_argument("--concurrency", type=int, default=8, help="同時進行的請求數")
+    parser.add_argument("--rate", type=float, default=4.0, help="每秒最多送出的請求數，0 為不限制")
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    tasks = build_tasks(args.output_dir, args.cities, args.start_year, args.end_year, args.extension)
+    print(f"共 {len(tasks)} 個檔案待下載（已存在的檔案略過）")
+
+    start = time.time()
+    successful, failures = asyncio.run(fetch_all(args.endpoint, tasks, parse_params(args.param), args.concurrency,
+                                                 args.rate, args.retries, timeout=args.timeout))
+
+    print(f"\n下載完成！耗時 {time.time() - start:.1f} 秒")
+    print(f"成功下載: {successful} 個檔案")
+    print(f"失敗數量: {len(failures)} 個檔案")
+    print(f"\n檔案儲存位置: {args.output_dir}")
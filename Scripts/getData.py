@@ -4,29 +4,42 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select
+from selenium.common.exceptions import TimeoutException
 import time
 import os
 import glob
+import json
+import queue
+import argparse
+import multiprocessing
 
-city_code = {
-    "A": "臺北市", "B": "新北市", "C": "台中市", "D": "台南市", "E": "高雄市",
-    "F": "桃園市", "G": "新竹縣", "H": "苗栗縣", "I": "彰化縣", "J": "南投縣",
-    "K": "雲林縣", "L": "嘉義縣", "M": "屏東縣", "N": "宜蘭縣", "O": "花蓮縣",
-    "P": "台東縣", "Q": "基隆市", "R": "新竹市", "S": "嘉義市", "T": "澎湖縣",
-    "U": "金門縣", "V": "連江縣"
-}
+import pipelineMetrics
+from cityCodes import city_code
 
-download_path = "C:\\Users\\斯煒嵐\\OneDrive\\桌面\\DownloadedData"
-if not os.path.exists(download_path):
-    os.makedirs(download_path)
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+DASHBOARD_URL = "https://gis.ris.gov.tw/dashboard.html?key=E01"
+DEFAULT_DOWNLOAD_PATH = "C:\\Users\\斯煒嵐\\OneDrive\\桌面\\DownloadedData"
+CHECKPOINT_FILE = "checkpoint.jsonl"
+PARTIAL_SUFFIXES = (".crdownload", ".tmp", ".part")
+DOWNLOAD_TIMEOUT = 30
 
-options = Options()
-options.add_experimental_option("prefs", {
-    "download.default_directory": download_path,
-    "download.prompt_for_download": False,
-    "safebrowsing.enabled": True
-})
-driver = webdriver.Chrome(options=options)
+def create_driver(download_dir, headless=False):
+    """建立下載到指定資料夾的 Chrome"""
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+    options.add_experimental_option("prefs", {
+        "download.default_directory": os.path.abspath(download_dir),
+        "download.prompt_for_download": False,
+        "safebrowsing.enabled": True
+    })
+    return webdriver.Chrome(options=options)
 
 def find_element_by_multiple_selectors(driver, selectors, timeout=10):
     """使用多種選擇器尋找元素"""
@@ -45,105 +58,296 @@ def find_element_by_multiple_selectors(driver, selectors, timeout=10):
             continue
     return None
 
-def wait_for_download(download_dir, timeout=30):
-    """等待下載完成"""
-    start_time = time.time()
-    initial_files = set(glob.glob(os.path.join(download_dir, "*")))
-    
-    time.sleep(3)
-    
-    while time.time() - start_time < timeout:
-        downloading_files = glob.glob(os.path.join(download_dir, "*.crdownload"))
-        current_files = set(glob.glob(os.path.join(download_dir, "*")))
+def wait_for_page(driver, timeout=15):
+    """等待頁面載入完成且沒有進行中的 jQuery 請求"""
+    try:
+        WebDriverWait(driver, timeout).until(lambda d: d.execute_script(
+            "return document.readyState === 'complete' && (!window.jQuery || jQuery.active === 0)"))
+        return True
+    except TimeoutException:
+        pipelineMetrics.count("getData.page_timeouts")
+        return False
+
+def is_partial_download(path):
+    """瀏覽器下載中的暫存檔"""
+    return path.endswith(PARTIAL_SUFFIXES)
+
+if Observer is not None:
+    class DownloadEventHandler(FileSystemEventHandler):
+        """將下載資料夾中完成寫入的檔案放入佇列"""
+        def __init__(self, completed):
+            self.completed = completed
         
-        if not downloading_files:
-            new_files = current_files - initial_files
-            if new_files:
-                return True
-            
-            if len(current_files) > len(initial_files):
-                return True
-            
-            recent_files = []
-            for f in current_files:
-                if os.path.isfile(f) and os.path.getmtime(f) > start_time - 5:
-                    recent_files.append(f)
-            
-            if recent_files and time.time() - start_time > 8:
-                return True
+        def on_created(self, event):
+            if not event.is_directory and not is_partial_download(event.src_path):
+                self.completed.put(event.src_path)
         
-        time.sleep(2)
+        def on_moved(self, event):
+            # Chrome 先寫入 .crdownload，完成後才改名為正式檔名
+            if not event.is_directory and not is_partial_download(event.dest_path):
+                self.completed.put(event.dest_path)
+
+class DownloadWatcher:
+    """監看下載資料夾，回傳每次點擊下載所產生的檔案
+
+    有安裝 watchdog 時由檔案系統事件通知，否則退回輪詢資料夾。
+    """
     
-    final_files = set(glob.glob(os.path.join(download_dir, "*")))
-    if len(final_files) > len(initial_files) or final_files != initial_files:
-        return True
+    def __init__(self, download_dir, poll_interval=0.2):
+        self.download_dir = os.path.abspath(download_dir)
+        self.poll_interval = poll_interval
+        self.completed = queue.Queue()
+        self.existing = set()
+        self.observer = None
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.schedule(DownloadEventHandler(self.completed), self.download_dir, recursive=False)
+            self.observer.start()
+    
+    def expect(self):
+        """點擊下載前呼叫：記錄已存在的檔案並清掉先前的事件"""
+        self.existing = set(os.listdir(self.download_dir))
+        while not self.completed.empty():
+            self.completed.get_nowait()
+    
+    def is_new_file(self, path):
+        name = os.path.basename(path)
+        return (name not in self.existing and not is_partial_download(name)
+                and os.path.isfile(path) and not os.path.exists(path + ".crdownload"))
+    
+    def wait(self, timeout=30):
+        """等待這次下載完成，回傳產生的檔案路徑，逾時回傳 None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if self.observer is not None:
+                try:
+                    path = self.completed.get(timeout=remaining)
+                except queue.Empty:
+                    return None
+                if self.is_new_file(path):
+                    self.existing.add(os.path.basename(path))
+                    return path
+            else:
+                for name in os.listdir(self.download_dir):
+                    path = os.path.join(self.download_dir, name)
+                    if self.is_new_file(path):
+                        self.existing.add(name)
+                        return path
+                time.sleep(self.poll_interval)
     
-    return False
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
 
-def rename_downloaded_file(download_dir, city_code, year, month):
-    """重命名下載的檔案"""
-    import time
+def rename_downloaded_file(downloaded_file, city_code, year, month):
+    """將這次下載的檔案重命名為 {代碼}_{年}{月}，回傳新的檔案路徑，失敗時回傳 None"""
+    file_extension = os.path.splitext(downloaded_file)[1]
+    new_filepath = os.path.join(os.path.dirname(downloaded_file), f"{city_code}_{year:02d}{month:02d}{file_extension}")
     
-    time.sleep(3)
+    if downloaded_file == new_filepath:
+        return new_filepath
     
-    all_files = glob.glob(os.path.join(download_dir, "*"))
-    files = [f for f in all_files if not f.endswith('.crdownload') and os.path.isfile(f)]
+    try:
+        os.replace(downloaded_file, new_filepath)
+        return new_filepath
+    except OSError:
+        return None
+
+def download_month(driver, watcher, code, city_name, year, month, log=print):
+    """在儀表板下載單一縣市單月的淨遷徙資料，回傳重命名後的檔案路徑，失敗時回傳 None"""
+    with pipelineMetrics.stage("getData.page_load"):
+        driver.get(DASHBOARD_URL)
+        wait_for_page(driver)
     
-    if files:
-        target_file = None
-        
-        keywords = ["人口", "統計", "地區", "全國", "縣市"]
-        for f in files:
-            filename = os.path.basename(f)
-            if any(keyword in filename for keyword in keywords):
-                if not target_file or os.path.getmtime(f) > os.path.getmtime(target_file):
-                    target_file = f
-        
-        if not target_file:
-            target_file = max(files, key=os.path.getmtime)
-        
-        original_filename = os.path.basename(target_file)
-        file_extension = os.path.splitext(target_file)[1]
-        
-        new_filename = f"{city_code}_{year:02d}{month:02d}{file_extension}"
-        new_filepath = os.path.join(download_dir, new_filename)
-        
-        if target_file == new_filepath:
-            return True
-        
-        if os.path.exists(new_filepath):
-            try:
-                os.remove(new_filepath)
-            except Exception:
-                return False
-        
+    # 選擇淨遷徙人數
+    net_migration_selectors = [
+        ("xpath", "//input[@type='radio' and @name='option0' and @value='0_3']"),
+        ("css", "input[name='option0'][value='0_3']"),
+        ("xpath", "//input[@type='radio' and @value='0_3']"),
+        ("xpath", "//input[@type='radio'][3]"),
+        ("xpath", "//label[contains(text(), '淨遷徙人數')]/preceding-sibling::input[@type='radio']"),
+        ("xpath", "//label[contains(text(), '淨遷徙人數')]/../input[@type='radio']")
+    ]
+    
+    net_migration_radio = find_element_by_multiple_selectors(driver, net_migration_selectors)
+    if net_migration_radio:
+        try:
+            net_migration_radio.click()
+            wait_for_page(driver)
+        except Exception:
+            pass
+    
+    # 選擇年份
+    year_selectors = [
+        ("xpath", "//select[@class='input-sm mb-md'][1]"),
+        ("xpath", "//select[option[contains(@value, '105') or contains(@value, '113')]]"),
+        ("css", "select:nth-of-type(1)"),
+        ("xpath", "//select[contains(@class, 'input-sm')][1]"),
+        ("id", "yearSelect"),
+        ("name", "year")
+    ]
+    
+    year_dropdown = find_element_by_multiple_selectors(driver, year_selectors)
+    if year_dropdown:
         try:
-            os.rename(target_file, new_filepath)
-            return True
+            year_select = Select(year_dropdown)
+            year_select.select_by_value(str(year))
+            wait_for_page(driver)
         except Exception:
-            return False
+            return None
     else:
-        return False
-
-try:
-    driver.get("https://gis.ris.gov.tw/dashboard.html?key=E01")
-    wait = WebDriverWait(driver, 15)
+        return None
     
-    print("等待頁面載入...")
-    time.sleep(8)
+    # 選擇月份
+    month_selectors = [
+        ("xpath", "//select[@class='input-sm mb-md'][2]"),
+        ("xpath", "//select[option[@value='1'] and option[@value='12']]"),
+        ("css", "select:nth-of-type(2)"),
+        ("xpath", "//select[contains(@class, 'input-sm')][2]"),
+        ("xpath", "//span[contains(text(), '月')]/preceding-sibling::select"),
+        ("id", "monthSelect"),
+        ("name", "month")
+    ]
     
-    print("\n開始下載各縣市資料...")
-    print("注意：這將下載 22個縣市 × 11年 × 12個月 = 2904個檔案")
+    month_dropdown = find_element_by_multiple_selectors(driver, month_selectors)
+    if month_dropdown:
+        try:
+            month_select = Select(month_dropdown)
+            month_select.select_by_value(str(month))
+            wait_for_page(driver)
+        except Exception:
+            return None
+    else:
+        return None
     
-    confirmation = input("\n確定要開始大量下載嗎？輸入 'yes' 繼續，或任意鍵取消: ")
-    if confirmation.lower() != 'yes':
-        print("取消下載")
-        driver.quit()
-        exit()
+    # 選擇縣市
+    city_selectors = [
+        ("xpath", "//select[contains(@class, 'form-control')]"),
+        ("css", "select.form-control"),
+        ("xpath", "//div[@class='form-group']//select"),
+        ("xpath", "//select[option[contains(text(), '雲林縣') or contains(text(), '臺北市')]]"),
+        ("xpath", "//button[contains(@class, 'dropdown-toggle')]/following-sibling::ul//a"),
+        ("css", ".dropdown-menu a"),
+        ("id", "countySelect"),
+        ("name", "county")
+    ]
+    
+    multiselect_button_selectors = [
+        ("xpath", "//button[contains(@class, 'multiselect') and contains(@class, 'dropdown-toggle')]"),
+        ("css", "button.multiselect.dropdown-toggle"),
+        ("xpath", "//button[@class='multiselect dropdown-toggle btn btn-default']")
+    ]
+    
+    multiselect_button = find_element_by_multiple_selectors(driver, multiselect_button_selectors)
+    if multiselect_button:
+        try:
+            multiselect_button.click()
+            
+            city_option_selectors = [
+                ("xpath", f"//ul[contains(@class, 'multiselect-container')]//label[contains(text(), '{city_name}')]"),
+                ("xpath", f"//ul[@class='multiselect-container dropdown-menu']//label[contains(text(), '{city_name}')]"),
+                ("xpath", f"//li//label[contains(text(), '{city_name}')]"),
+                ("xpath", f"//input[@type='checkbox']/following-sibling::text()[contains(., '{city_name}')]/../input"),
+                ("css", f".multiselect-container label:contains('{city_name}')")
+            ]
+            
+            city_option = find_element_by_multiple_selectors(driver, city_option_selectors, timeout=5)
+            if city_option:
+                city_option.click()
+                wait_for_page(driver)
+                
+                try:
+                    multiselect_button.click()
+                except:
+                    pass
+            else:
+                return None
+        except Exception:
+            pass
+    
+    if not multiselect_button:
+        city_dropdown = find_element_by_multiple_selectors(driver, city_selectors)
+        if city_dropdown:
+            try:
+                city_select = Select(city_dropdown)
+                try:
+                    city_select.select_by_visible_text(city_name)
+                except:
+                    try:
+                        city_select.select_by_value(code)
+                    except:
+                        return None
+                wait_for_page(driver)
+            except Exception:
+                return None
+        else:
+            return None
+    
+    # 點擊查詢
+    query_selectors = [
+        ("xpath", "//button[contains(text(), '查詢')]"),
+        ("css", "button.btn-primary"),
+        ("xpath", "//button[@type='submit']"),
+        ("id", "queryBtn"),
+        ("class", "btn-query")
+    ]
+    
+    query_button = find_element_by_multiple_selectors(driver, query_selectors)
+    if query_button:
+        try:
+            with pipelineMetrics.stage("getData.query"):
+                query_button.click()
+                wait_for_page(driver)
+        except Exception:
+            return None
+    else:
+        return None
+    
+    # 點擊下載
+    download_selectors = [
+        ("xpath", "//div[@class='col-md-6'][2]//i[@class='fa fa-download']"),
+        ("xpath", "//div[@class='col-md-6'][position()=2]//a[contains(@class, 'fa-download')]"),
+        ("xpath", "(//div[@class='col-md-6'])[2]//i[@class='fa fa-download']"),
+        ("xpath", "//section[contains(@class, 'panel') and .//text()[contains(., '統計表')]]//i[@class='fa fa-download']"),
+        ("xpath", "//header[contains(text(), '統計表')]/following-sibling::*//i[@class='fa fa-download']"),
+        ("css", ".col-md-6:nth-child(2) .fa-download"),
+        ("xpath", "//i[@class='fa fa-download'][2]")
+    ]
     
-    start_year = 103
-    end_year = 113
+    download_button = find_element_by_multiple_selectors(driver, download_selectors)
+    if download_button:
+        try:
+            watcher.expect()
+            download_button.click()
+        except Exception:
+            return None
+    else:
+        return None
+
+    with pipelineMetrics.stage("getData.download"):
+        downloaded_file = watcher.wait(DOWNLOAD_TIMEOUT)
+    if downloaded_file:
+        downloaded = rename_downloaded_file(downloaded_file, code, year, month)
+        if downloaded:
+            pipelineMetrics.add("getData.download", nbytes=os.path.getsize(downloaded))
+            pipelineMetrics.count("getData.downloads_ok")
+            log(f"    ✓ 成功下載: {code}_{year:02d}{month:02d}")
+        else:
+            pipelineMetrics.count("getData.rename_failures")
+            log(f"    ✗ 下載成功但重命名失敗: {year}年{month}月")
+    else:
+        downloaded = None
+        pipelineMetrics.count("getData.download_timeouts")
+        log(f"    ✗ 下載超時: {year}年{month}月")
     
+    return downloaded
+
+def download_all(driver, watcher, start_year, end_year):
+    """依序下載所有縣市每月資料，回傳 (嘗試數, 成功數)"""
     total_downloads = 0
     successful_downloads = 0
     
@@ -155,191 +359,140 @@ try:
                 try:
                     print(f"  下載 {year}年{month}月 資料...")
                     total_downloads += 1
-                    
-                    driver.get("https://gis.ris.gov.tw/dashboard.html?key=E01")
-                    time.sleep(5)
-                    
-                    # 選擇淨遷徙人數
-                    net_migration_selectors = [
-                        ("xpath", "//input[@type='radio' and @name='option0' and @value='0_3']"),
-                        ("css", "input[name='option0'][value='0_3']"),
-                        ("xpath", "//input[@type='radio' and @value='0_3']"),
-                        ("xpath", "//input[@type='radio'][3]"),
-                        ("xpath", "//label[contains(text(), '淨遷徙人數')]/preceding-sibling::input[@type='radio']"),
-                        ("xpath", "//label[contains(text(), '淨遷徙人數')]/../input[@type='radio']")
-                    ]
-                    
-                    net_migration_radio = find_element_by_multiple_selectors(driver, net_migration_selectors)
-                    if net_migration_radio:
-                        try:
-                            net_migration_radio.click()
-                            time.sleep(2)
-                        except Exception:
-                            pass
-                    
-                    # 選擇年份
-                    year_selectors = [
-                        ("xpath", "//select[@class='input-sm mb-md'][1]"),
-                        ("xpath", "//select[option[contains(@value, '105') or contains(@value, '113')]]"),
-                        ("css", "select:nth-of-type(1)"),
-                        ("xpath", "//select[contains(@class, 'input-sm')][1]"),
-                        ("id", "yearSelect"),
-                        ("name", "year")
-                    ]
-                    
-                    year_dropdown = find_element_by_multiple_selectors(driver, year_selectors)
-                    if year_dropdown:
-                        try:
-                            year_select = Select(year_dropdown)
-                            year_select.select_by_value(str(year))
-                            time.sleep(2)
-                        except Exception:
-                            continue
-                    else:
-                        continue
-                    
-                    # 選擇月份
-                    month_selectors = [
-                        ("xpath", "//select[@class='input-sm mb-md'][2]"),
-                        ("xpath", "//select[option[@value='1'] and option[@value='12']]"),
-                        ("css", "select:nth-of-type(2)"),
-                        ("xpath", "//select[contains(@class, 'input-sm')][2]"),
-                        ("xpath", "//span[contains(text(), '月')]/preceding-sibling::select"),
-                        ("id", "monthSelect"),
-                        ("name", "month")
-                    ]
-                    
-                    month_dropdown = find_element_by_multiple_selectors(driver, month_selectors)
-                    if month_dropdown:
-                        try:
-                            month_select = Select(month_dropdown)
-                            month_select.select_by_value(str(month))
-                            time.sleep(2)
-                        except Exception:
-                            continue
-                    else:
-                        continue
-                    
-                    # 選擇縣市
-                    city_selectors = [
-                        ("xpath", "//select[contains(@class, 'form-control')]"),
-                        ("css", "select.form-control"),
-                        ("xpath", "//div[@class='form-group']//select"),
-                        ("xpath", "//select[option[contains(text(), '雲林縣') or contains(text(), '臺北市')]]"),
-                        ("xpath", "//button[contains(@class, 'dropdown-toggle')]/following-sibling::ul//a"),
-                        ("css", ".dropdown-menu a"),
-                        ("id", "countySelect"),
-                        ("name", "county")
-                    ]
-                    
-                    multiselect_button_selectors = [
-                        ("xpath", "//button[contains(@class, 'multiselect') and contains(@class, 'dropdown-toggle')]"),
-                        ("css", "button.multiselect.dropdown-toggle"),
-                        ("xpath", "//button[@class='multiselect dropdown-toggle btn btn-default']")
-                    ]
-                    
-                    multiselect_button = find_element_by_multiple_selectors(driver, multiselect_button_selectors)
-                    if multiselect_button:
-                        try:
-                            multiselect_button.click()
-                            time.sleep(2)
-                            
-                            city_option_selectors = [
-                                ("xpath", f"//ul[contains(@class, 'multiselect-container')]//label[contains(text(), '{city_name}')]"),
-                                ("xpath", f"//ul[@class='multiselect-container dropdown-menu']//label[contains(text(), '{city_name}')]"),
-                                ("xpath", f"//li//label[contains(text(), '{city_name}')]"),
-                                ("xpath", f"//input[@type='checkbox']/following-sibling::text()[contains(., '{city_name}')]/../input"),
-                                ("css", f".multiselect-container label:contains('{city_name}')")
-                            ]
-                            
-                            city_option = find_element_by_multiple_selectors(driver, city_option_selectors, timeout=5)
-                            if city_option:
-                                city_option.click()
-                                time.sleep(2)
-                                
-                                try:
-                                    multiselect_button.click()
-                                    time.sleep(1)
-                                except:
-                                    pass
-                            else:
-                                continue
-                        except Exception:
-                            pass
-                    
-                    if not multiselect_button:
-                        city_dropdown = find_element_by_multiple_selectors(driver, city_selectors)
-                        if city_dropdown:
-                            try:
-                                city_select = Select(city_dropdown)
-                                try:
-                                    city_select.select_by_visible_text(city_name)
-                                except:
-                                    try:
-                                        city_select.select_by_value(code)
-                                    except:
-                                        continue
-                                time.sleep(2)
-                            except Exception:
-                                continue
-                        else:
-                            continue
-                    
-                    # 點擊查詢
-                    query_selectors = [
-                        ("xpath", "//button[contains(text(), '查詢')]"),
-                        ("css", "button.btn-primary"),
-                        ("xpath", "//button[@type='submit']"),
-                        ("id", "queryBtn"),
-                        ("class", "btn-query")
-                    ]
-                    
-                    query_button = find_element_by_multiple_selectors(driver, query_selectors)
-                    if query_button:
-                        try:
-                            query_button.click()
-                            time.sleep(5)
-                        except Exception:
-                            continue
-                    else:
-                        continue
-                    
-                    # 點擊下載
-                    download_selectors = [
-                        ("xpath", "//div[@class='col-md-6'][2]//i[@class='fa fa-download']"),
-                        ("xpath", "//div[@class='col-md-6'][position()=2]//a[contains(@class, 'fa-download')]"),
-                        ("xpath", "(//div[@class='col-md-6'])[2]//i[@class='fa fa-download']"),
-                        ("xpath", "//section[contains(@class, 'panel') and .//text()[contains(., '統計表')]]//i[@class='fa fa-download']"),
-                        ("xpath", "//header[contains(text(), '統計表')]/following-sibling::*//i[@class='fa fa-download']"),
-                        ("css", ".col-md-6:nth-child(2) .fa-download"),
-                        ("xpath", "//i[@class='fa fa-download'][2]")
-                    ]
-                    
-                    download_button = find_element_by_multiple_selectors(driver, download_selectors)
-                    if download_button:
-                        try:
-                            download_button.click()
-                            time.sleep(3)
-                        except Exception:
-                            continue
-                    else:
-                        continue
-                    
-                    if wait_for_download(download_path):
-                        if rename_downloaded_file(download_path, code, year, month):
-                            successful_downloads += 1
-                            print(f"    ✓ 成功下載: {code}_{year:02d}{month:02d}")
-                        else:
-                            print(f"    ✗ 下載成功但重命名失敗: {year}年{month}月")
-                    else:
-                        print(f"    ✗ 下載超時: {year}年{month}月")
-                    
-                    time.sleep(3)
-                    
+                    with pipelineMetrics.stage("getData.task"):
+                        downloaded = download_month(driver, watcher, code, city_name, year, month)
+                    if downloaded:
+                        successful_downloads += 1
                 except Exception:
+                    pipelineMetrics.count("getData.errors")
                     print(f"    ✗ 處理 {year}年{month}月 時發生錯誤")
                     continue
     
+    return total_downloads, successful_downloads
+
+def task_key(code, year, month):
+    """下載工作在進度檔中的鍵值，與輸出檔名相同（不含副檔名）"""
+    return f"{code}_{year:02d}{month:02d}"
+
+def load_checkpoint(path):
+    """讀取進度檔，回傳各工作失敗的次數；已成功的工作以磁碟上的檔案為準"""
+    failures = {}
+    if not os.path.exists(path):
+        return failures
+    
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("status") == "ok":
+                failures.pop(entry["task"], None)
+            else:
+                failures[entry["task"]] = failures.get(entry["task"], 0) + 1
+    return failures
+
+def build_tasks(output_dir, cities, start_year, end_year, failures=None, max_attempts=3):
+    """列出尚未下載的 (縣市, 年, 月) 工作，略過已存在的檔案與失敗太多次的工作"""
+    failures = failures or {}
+    tasks = []
+    skipped = 0
+    for code in cities:
+        for year in range(start_year, end_year + 1):
+            for month in range(1, 13):
+                key = task_key(code, year, month)
+                if glob.glob(os.path.join(output_dir, f"{key}.*")):
+                    continue
+                if failures.get(key, 0) >= max_attempts:
+                    skipped += 1
+                    continue
+                if failures.get(key):
+                    pipelineMetrics.count("getData.retried_tasks")
+                tasks.append((code, city_code[code], year, month))
+    return tasks, skipped
+
+def worker_main(worker_id, output_dir, headless, task_queue, result_queue):
+    """工作程序：使用自己的瀏覽器與下載資料夾，完成的檔案移到輸出資料夾"""
+    download_dir = os.path.join(output_dir, f".worker_{worker_id}")
+    os.makedirs(download_dir, exist_ok=True)
+    
+    def log(message):
+        print(f"  [worker {worker_id}] {message.strip()}")
+    
+    driver = create_driver(download_dir, headless)
+    watcher = DownloadWatcher(download_dir)
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            
+            code, city_name, year, month = task
+            output_path = None
+            pipelineMetrics.METRICS.reset()
+            try:
+                with pipelineMetrics.stage("getData.task"):
+                    downloaded = download_month(driver, watcher, code, city_name, year, month, log=log)
+                if downloaded:
+                    output_path = os.path.join(output_dir, os.path.basename(downloaded))
+                    os.replace(downloaded, output_path)
+            except Exception as e:
+                pipelineMetrics.count("getData.errors")
+                log(f"✗ 處理 {city_name} {year}年{month}月 時發生錯誤: {e}")
+            result_queue.put((worker_id, task, output_path, pipelineMetrics.METRICS.snapshot()))
+    finally:
+        watcher.stop()
+        driver.quit()
+
+def run_workers(output_dir, tasks, workers, headless=True, checkpoint_path=None):
+    """將工作分配給多個瀏覽器程序，每完成一個就寫入進度檔，回傳成功數"""
+    checkpoint_path = checkpoint_path or os.path.join(output_dir, CHECKPOINT_FILE)
+    
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    for task in tasks:
+        task_queue.put(task)
+    
+    workers = max(1, min(workers, len(tasks)))
+    processes = []
+    for worker_id in range(workers):
+        task_queue.put(None)
+        process = multiprocessing.Process(target=worker_main,
+                                          args=(worker_id, output_dir, headless, task_queue, result_queue))
+        process.start()
+        processes.append(process)
+    
+    successful = 0
+    done = 0
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        while done < len(tasks):
+            try:
+                worker_id, (code, city_name, year, month), output_path, metrics = result_queue.get(timeout=5)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    print("所有工作程序皆已結束，剩餘的工作將於下次執行時繼續")
+                    break
+                continue
+            
+            done += 1
+            pipelineMetrics.METRICS.merge(metrics)
+            key = task_key(code, year, month)
+            entry = {"task": key, "status": "ok" if output_path else "failed", "worker": worker_id, "time": time.time()}
+            if output_path:
+                successful += 1
+                entry["file"] = os.path.basename(output_path)
+                print(f"[{done}/{len(tasks)}] ✓ {key}")
+            else:
+                print(f"[{done}/{len(tasks)}] ✗ {city_name} {year}年{month}月")
+            checkpoint.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+    
+    for process in processes:
+        process.join()
+    return successful
+
+def print_summary(total_downloads, successful_downloads, download_path):
+    """輸出下載統計"""
     print(f"\n下載完成！")
     print(f"統計結果:")
     print(f"總計嘗試下載: {total_downloads} 個檔案")
@@ -351,10 +504,68 @@ try:
         
     print(f"\n檔案儲存位置: {download_path}")
 
-except Exception:
-    print(f"程式執行時發生錯誤")
+def run_interactive(download_path, start_year, end_year, confirm=True):
+    """原本的單一瀏覽器下載流程"""
+    driver = create_driver(download_path)
+    watcher = DownloadWatcher(download_path)
+    try:
+        driver.get(DASHBOARD_URL)
+        
+        print("等待頁面載入...")
+        wait_for_page(driver)
+        
+        print("\n開始下載各縣市資料...")
+        print("注意：這將下載 22個縣市 × 11年 × 12個月 = 2904個檔案")
+        
+        if confirm:
+            confirmation = input("\n確定要開始大量下載嗎？輸入 'yes' 繼續，或任意鍵取消: ")
+            if confirmation.lower() != 'yes':
+                print("取消下載")
+                return
+        
+        total_downloads, successful_downloads = download_all(driver, watcher, start_year, end_year)
+        print_summary(total_downloads, successful_downloads, download_path)
+    
+    except Exception:
+        print(f"程式執行時發生錯誤")
+    
+    finally:
+        if confirm:
+            input("按 Enter 鍵關閉瀏覽器...")
+        watcher.stop()
+        driver.quit()
+        print("瀏覽器已關閉")
 
-finally:
-    input("按 Enter 鍵關閉瀏覽器...")
-    driver.quit()
-    print("瀏覽器已關閉") 
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="由內政部戶政司儀表板下載各縣市每月淨遷徙資料")
+    parser.add_argument("--output-dir", default=DEFAULT_DOWNLOAD_PATH)
+    parser.add_argument("--start-year", type=int, default=103)
+    parser.add_argument("--end-year", type=int, default=113)
+    parser.add_argument("--cities", default="".join(city_code), help="要下載的縣市代碼，例如 ABF（僅工作佇列模式）")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="以工作佇列模式同時開啟的無頭瀏覽器數，0 為原本的單一瀏覽器流程")
+    parser.add_argument("--max-attempts", type=int, default=3, help="進度檔中失敗達此次數的工作不再重試")
+    parser.add_argument("--show-browser", action="store_true", help="工作佇列模式下顯示瀏覽器視窗")
+    parser.add_argument("--yes", action="store_true", help="不詢問確認，直接開始下載")
+    parser.add_argument("--metrics", help="將各階段的耗時與重試、逾時次數寫入此 JSON 檔")
+    parser.add_argument("--profile", help="以 cProfile 記錄主程序並寫入此檔")
+    args = parser.parse_args()
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    with pipelineMetrics.profile(args.profile):
+        if args.workers <= 0:
+            run_interactive(args.output_dir, args.start_year, args.end_year, confirm=not args.yes)
+        else:
+            checkpoint_path = os.path.join(args.output_dir, CHECKPOINT_FILE)
+            tasks, skipped = build_tasks(args.output_dir, args.cities, args.start_year, args.end_year,
+                                         load_checkpoint(checkpoint_path), args.max_attempts)
+            print(f"共 {len(tasks)} 個檔案待下載（已存在的檔案略過，{skipped} 個失敗 {args.max_attempts} 次以上的工作略過）")
+        
+            start = time.time()
+            successful = run_workers(args.output_dir, tasks, args.workers, headless=not args.show_browser,
+                                     checkpoint_path=checkpoint_path) if tasks else 0
+            print(f"耗時 {time.time() - start:.1f} 秒")
+            print_summary(len(tasks), successful, args.output_dir)
+    if args.metrics:
+        pipelineMetrics.METRICS.write(args.metrics)
@@ -0,0 +1,158 @@
+import codecs
+import pandas as pd
+
+SAMPLE_SIZE = 64 * 1024
+DEFAULT_CHUNKSIZE = 200_000
+
+NUMBER = "number"
+ROC_DATE = "roc_date"
+CATEGORY = "category"
+
+# 實價登錄欄位的宣告型別，以雙語欄位名稱中的中文部分為鍵；未列出的欄位維持文字
+LVR_SCHEMA = {
+    "鄉鎮市區": CATEGORY,
+    "交易標的": CATEGORY,
+    "交易年月日": ROC_DATE,
+    "建物型態": CATEGORY,
+    "主要用途": CATEGORY,
+    "土地移轉總面積平方公尺": NUMBER,
+    "建物移轉總面積平方公尺": NUMBER,
+    "總價元": NUMBER,
+    "單價元平方公尺": NUMBER,
+    "車位移轉總面積平方公尺": NUMBER,
+    "車位移轉總面積(平方公尺)": NUMBER,
+    "車位總價元": NUMBER,
+    "主建物面積": NUMBER,
+    "附屬建物面積": NUMBER,
+    "陽台面積": NUMBER,
+    "建物現況格局-房": NUMBER,
+    "建物現況格局-廳": NUMBER,
+    "建物現況格局-衛": NUMBER,
+    "來源資料夾": CATEGORY,
+}
+
+RESIDENTIAL_KEY = "建物型態"
+RESIDENTIAL_TYPES = ("住宅大樓", "華廈", "公寓", "透天厝", "套房")
+
+def column_key(column):
+    """取出雙語欄位名稱中的中文部分"""
+
+    return str(column).split("_", 1)[0]
+
+def sniff_encoding(path, sample_size=SAMPLE_SIZE):
+    """由檔案開頭的位元組判斷編碼：有 BOM 為 utf-8-sig，可解碼為 utf-8，否則視為 big5"""
+
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'big5'
+
+def read_header(path, encoding, header_rows=1):
+    """只讀取標題列，多列標題合併為「中文_英文」的欄位名稱"""
+
+    header = pd.read_csv(path, encoding=encoding, header=list(range(header_rows)), nrows=0)
+    if isinstance(header.columns, pd.MultiIndex):
+        return ['_'.join(col).strip() for col in header.columns.values]
+    return header.columns.tolist()
+
+def parse_roc_date(series):
+    """將民國年月日（如 1130215）轉為日期，無效的日期設為 NaT"""
+
+    value = pd.to_numeric(series, errors='coerce')
+    parts = pd.DataFrame({
+        'year': value // 10000 + 1911,
+        'month': value // 100 % 100,
+        'day': value % 100,
+    })
+    return pd.to_datetime(parts, errors='coerce')
+
+def to_number(series):
+    """去除千分位逗號後轉為數值，無法轉換的值設為 NaN"""
+
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.replace(',', '', regex=False)
+    return pd.to_numeric(series, errors='coerce')
+
+def is_residential(series):
+    """依建物型態判斷是否為住宅交易"""
+
+    return series.astype(str).str.startswith(RESIDENTIAL_TYPES)
+
+def find_column(columns, key):
+    """依中文欄位名稱找出實際的欄位名稱"""
+
+    for column in columns:
+        if column_key(column) == key:
+            return column
+    return None
+
+def apply_schema(chunk, residential_column=None, drop_residential=False):
+    """依宣告型別轉換單一區塊，並在此時就濾掉非住宅的交易"""
+
+    if residential_column is not None:
+        chunk = chunk[is_residential(chunk[residential_column])]
+        if drop_residential:
+            chunk = chunk.drop(columns=residential_column)
+    for column in chunk.columns:
+        kind = LVR_SCHEMA.get(column_key(column))
+        if kind == NUMBER:
+            chunk[column] = to_number(chunk[column])
+        elif kind == ROC_DATE:
+            chunk[column] = parse_roc_date(chunk[column])
+        elif kind == CATEGORY:
+            chunk[column] = chunk[column].astype('category')
+    return chunk
+
+def read_lvr_csv(path, header_rows=1, columns=None, residential_only=False, chunksize=None, encoding=None):
+    """依宣告的欄位型別只解析一次實價登錄 CSV
+
+    header_rows 為 2 時表示原始下載檔的中英兩列標題，合併後的檔案為 1；
+    columns 以中文欄位名稱指定只載入哪些欄位。指定 chunksize 時回傳逐塊的迭代器。
+    """
+
+    encoding = encoding or sniff_encoding(path)
+    header = read_header(path, encoding, header_rows)
+
+    if columns is None:
+        positions = set(range(len(header)))
+    else:
+        wanted = set(columns)
+        positions = {i for i, name in enumerate(header) if column_key(name) in wanted}
+
+    residential_column = None
+    drop_residential = False
+    if residential_only:
+        residential_column = find_column(header, RESIDENTIAL_KEY)
+        if residential_column is None:
+            raise ValueError(f"{path} 沒有「{RESIDENTIAL_KEY}」欄位，無法篩選住宅交易")
+        position = header.index(residential_column)
+        drop_residential = position not in positions
+        positions.add(position)
+
+    positions = sorted(positions)
+    reader = pd.read_csv(path, encoding=encoding, header=None, skiprows=header_rows, usecols=positions,
+                         dtype=str, on_bad_lines='skip', chunksize=chunksize or DEFAULT_CHUNKSIZE)
+
+    def chunks():
+        with reader:
+            for chunk in reader:
+                chunk.columns = [header[i] for i in chunk.columns]
+                yield apply_schema(chunk, residential_column, drop_residential)
+
+    if chunksize:
+        return chunks()
+
+    parts = list(chunks())
+    if not parts:
+        return pd.DataFrame(columns=[header[i] for i in positions if header[i] != residential_column or not drop_residential])
+    df = pd.concat(parts, ignore_index=True)
+    for column in df.columns:
+        if LVR_SCHEMA.get(column_key(column)) == CATEGORY:
+            df[column] = df[column].astype('category')
+    return df
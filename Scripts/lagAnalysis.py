@@ -0,0 +1,202 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from scipy import stats
+except ImportError:
+    stats = None
+
+ROLLUP_PATH = Path("Data") / "MergedHousePricingData" / "price_rollup.csv"
+PANEL_PATH = Path("Data") / "people_cleanedData" / "migration_panel.csv"
+OUTPUT_FILE = "lag_analysis.csv"
+
+VARIABLES = ("net_migration", "population")
+MIN_OBSERVATIONS = 3
+
+def month_index(dates):
+    """民國年月 YYYMM 轉為連續的月份序號"""
+
+    dates = np.asarray(dates, dtype=np.int64)
+    return (dates // 100) * 12 + dates % 100 - 1
+
+def load_matrices(rollup_path=ROLLUP_PATH, panel_path=PANEL_PATH, variable="net_migration",
+                  start_year=None, end_year=None):
+    """讀入單價彙總表與遷徙人口長表，對齊為 (行政區 × 月份) 的矩陣
+
+    回傳 (keys, months, x, y)：x 為遷徙變數、y 為每月平均單價，缺值為 NaN。
+    """
+
+    key_types = {'city': str, 'district': str, 'date': str}
+    rollup = pd.read_csv(rollup_path, encoding='utf-8-sig', dtype=key_types, usecols=['city', 'district', 'date', 'mean'])
+    panel = pd.read_csv(panel_path, encoding='utf-8-sig', dtype=key_types, usecols=['city', 'district', 'date', variable])
+
+    for df in (rollup, panel):
+        df['month'] = month_index(df['date'].astype(int))
+
+    keys = pd.MultiIndex.from_frame(
+        rollup[['city', 'district']].drop_duplicates().merge(panel[['city', 'district']].drop_duplicates())
+    ).sort_values()
+
+    first = min(rollup['month'].min(), panel['month'].min())
+    last = max(rollup['month'].max(), panel['month'].max())
+    if start_year is not None:
+        first = max(first, int(start_year) * 12)
+    if end_year is not None:
+        last = min(last, int(end_year) * 12 + 11)
+    months = np.arange(first, last + 1)
+
+    def to_matrix(df, column):
+        matrix = df.pivot_table(index=['city', 'district'], columns='month', values=column, aggfunc='first')
+        return matrix.reindex(index=keys, columns=months).to_numpy(dtype=np.float64)
+
+    return keys, months, to_matrix(panel, variable), to_matrix(rollup, 'mean')
+
+def pearson(x, y):
+    """逐列計算 Pearson 相關係數，只使用兩者皆有值的月份；回傳 (r, 樣本數)"""
+
+    mask = ~(np.isnan(x) | np.isnan(y))
+    n = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(mask, x, 0.0).sum(axis=1) / n
+        mean_y = np.where(mask, y, 0.0).sum(axis=1) / n
+        dx = np.where(mask, x - mean_x[:, None], 0.0)
+        dy = np.where(mask, y - mean_y[:, None], 0.0)
+        r = (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+    r[n < MIN_OBSERVATIONS] = np.nan
+    return r, n
+
+def cross_correlation(x, y, lags):
+    """各延遲月數下 x[t] 與 y[t + lag] 的相關係數，正的延遲表示 x 領先 y"""
+
+    months = x.shape[1]
+    result = np.full((x.shape[0], len(lags)), np.nan)
+    for j, lag in enumerate(lags):
+        if abs(lag) >= months:
+            continue
+        if lag >= 0:
+            result[:, j] = pearson(x[:, :months - lag], y[:, lag:])[0]
+        else:
+            result[:, j] = pearson(x[:, -lag:], y[:, :months + lag])[0]
+    return result
+
+def lagged(series, order):
+    """建立落後 1..order 期的矩陣，形狀為 (行政區, 月份 - order, order)"""
+
+    months = series.shape[1]
+    return np.stack([series[:, order - i:months - i] for i in range(1, order + 1)], axis=2)
+
+def residual_sum_of_squares(design, target, mask):
+    """逐列以最小平方法配適，回傳殘差平方和；遮罩外的月份以零列排除"""
+
+    design = np.where(mask[..., None], design, 0.0)
+    target = np.where(mask, target, 0.0)
+    beta = np.linalg.pinv(design) @ target[..., None]
+    residual = target - (design @ beta)[..., 0]
+    return (residual ** 2).sum(axis=1)
+
+def granger(x, y, order):
+    """以落後迴歸檢定 x 的過去值是否有助於預測 y，回傳 (F 值, p 值, 樣本數)
+
+    受限模型為 y 對常數項與自身落後 order 期迴歸，完整模型再加入 x 的落後 order 期。
+    未安裝 scipy 時 p 值為 NaN。
+    """
+
+    if order < 1 or order >= y.shape[1]:
+        nan = np.full(y.shape[0], np.nan)
+        return nan, nan, np.zeros(y.shape[0], dtype=int)
+
+    target = y[:, order:]
+    restricted = np.concatenate([np.ones(target.shape + (1,)), lagged(y, order)], axis=2)
+    full = np.concatenate([restricted, lagged(x, order)], axis=2)
+    mask = ~(np.isnan(target) | np.isnan(full).any(axis=2))
+    n = mask.sum(axis=1)
+
+    rss_restricted = residual_sum_of_squares(restricted, target, mask)
+    rss_full = residual_sum_of_squares(full, target, mask)
+    df_residual = n - full.shape[2]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f_stat = ((rss_restricted - rss_full) / order) / (rss_full / df_residual)
+    f_stat[df_residual < 1] = np.nan
+
+    p_value = np.full_like(f_stat, np.nan)
+    if stats is not None:
+        valid = ~np.isnan(f_stat)
+        p_value[valid] = stats.f.sf(f_stat[valid], order, df_residual[valid])
+    return f_stat, p_value, n
+
+def analyze(x, y, lags, order):
+    """對一批行政區計算相關、交叉相關與 Granger 統計量"""
+
+    r, n = pearson(x, y)
+    xcorr = cross_correlation(x, y, lags)
+    f_stat, p_value, granger_n = granger(x, y, order)
+    return {'months': n, 'pearson': r, 'xcorr': xcorr,
+            'granger_f': f_stat, 'granger_p': p_value, 'granger_n': granger_n}
+
+def analyze_parallel(x, y, lags, order, workers=1):
+    """將行政區分批交給多個程序計算後合併結果"""
+
+    if workers <= 1 or len(x) < 2 * workers:
+        return analyze(x, y, lags, order)
+
+    batches = np.array_split(np.arange(len(x)), workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(analyze, [x[b] for b in batches], [y[b] for b in batches],
+                                  [lags] * workers, [order] * workers))
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+def to_frame(keys, lags, result):
+    """將計算結果整理為每個行政區一列的表格"""
+
+    xcorr = result['xcorr']
+    best = np.full(len(keys), np.nan)
+    best_lag = np.full(len(keys), np.nan)
+    has_value = ~np.isnan(xcorr).all(axis=1)
+    if has_value.any():
+        position = np.nanargmax(np.abs(np.where(has_value[:, None], xcorr, 0.0)), axis=1)
+        best[has_value] = xcorr[has_value, position[has_value]]
+        best_lag[has_value] = np.asarray(lags)[position[has_value]]
+
+    df = keys.to_frame(index=False)
+    df['months'] = result['months']
+    df['pearson'] = result['pearson']
+    df['best_lag'] = pd.array(best_lag).astype('Int64')
+    df['best_xcorr'] = best
+    df['granger_f'] = result['granger_f']
+    df['granger_p'] = result['granger_p']
+    df['granger_n'] = result['granger_n']
+    for j, lag in enumerate(lags):
+        df[f'xcorr_{lag}'] = xcorr[:, j]
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="一次計算所有行政區房價與遷徙的相關、時間延遲與 Granger 統計量")
+    parser.add_argument("--rollup", default=str(ROLLUP_PATH), help="buildRollup.py 產生的單價彙總表")
+    parser.add_argument("--panel", default=str(PANEL_PATH), help="buildPanel.py 產生的遷徙人口長表")
+    parser.add_argument("--variable", choices=VARIABLES, default="net_migration", help="與房價比較的遷徙變數")
+    parser.add_argument("--max-lag", type=int, default=12, help="交叉相關的延遲範圍（±月）")
+    parser.add_argument("--order", type=int, default=3, help="Granger 檢定的落後期數")
+    parser.add_argument("--start-year", type=int)
+    parser.add_argument("--end-year", type=int)
+    parser.add_argument("--workers", type=int, default=1, help="同時計算的程序數")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    start = time.time()
+    keys, months, x, y = load_matrices(args.rollup, args.panel, args.variable, args.start_year, args.end_year)
+    print(f"共 {len(keys)} 個行政區 × {len(months)} 個月，載入耗時 {time.time() - start:.2f} 秒")
+
+    lags = list(range(-args.max_lag, args.max_lag + 1))
+    start = time.time()
+    result = analyze_parallel(x, y, lags, args.order, args.workers)
+    print(f"計算完成，耗時 {time.time() - start:.2f} 秒")
+    if stats is None:
+        print("未安裝 scipy，Granger 檢定只輸出 F 值")
+
+    df = to_frame(keys, lags, result)
+    df.to_csv(args.output, index=False, encoding='utf-8-sig')
+    print(f"結果儲存至 {args.output}")
@@ -1,9 +1,25 @@
 import os
+import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def merge_year_data(source_dirs, output_dir, year):
-    """合併單一年份的資料"""
+import binaryCache
+import buildRollup
+import columnarStore
+import ingestData
+import mergeManifest
+import pipelineMetrics
+
+OUTPUT_FORMATS = ("csv", "parquet", "both")
+
+SERIAL_KEY = "編號"
+SERIAL_HASH_KEY = "lvr_land_serial_"
+ROW_HASH_KEY = "lvr_land_rowkey_"
+
+def list_csv_files(source_dirs):
+    """列出各季度資料夾中不重複的CSV檔案名稱"""
     
     all_files = set()
     for dir_name in source_dirs:
@@ -11,106 +27,546 @@ def merge_year_data(source_dirs, output_dir, year):
             files = os.listdir(dir_name)
             csv_files = [f for f in files if f.endswith('.csv')]
             all_files.update(csv_files)
+    return all_files
+
+def source_read_args(idx):
+    """第一個季度資料夾使用中英兩列標題，其餘略過中文標題列"""
     
-    if not all_files:
-        print("  找不到任何CSV檔案，跳過...")
-        return
+    read_args = {'on_bad_lines': 'skip'}
+    if idx == 0:
+        read_args['header'] = [0, 1]
+    else:
+        read_args['header'] = 0
+        read_args['skiprows'] = 1
+    return read_args
 
-    print(f"找到 {len(all_files)} 個不重複的檔案名稱")
+def flatten_columns(df):
+    """將兩列標題合併為「中文_英文」的欄位名稱"""
     
-    for filename in sorted(all_files):
-        print(f"正在處理: {filename}")
-        
-        dataframes = []
-        first_columns = None
-        
-        for idx, dir_name in enumerate(source_dirs):
-            file_path = Path(dir_name) / filename
-            if not file_path.exists():
-                continue
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = ['_'.join(col).strip() for col in df.columns.values]
+    return df
 
-            df = None
-            try:
-                read_args = {'on_bad_lines': 'skip'}
-                if idx == 0:
-                    read_args['header'] = [0, 1]
-                else:
-                    read_args['header'] = 0
-                    read_args['skiprows'] = 1
+def align_columns(columns, first_columns):
+    """依第一個來源的欄位名稱對齊其他來源的欄位，無法對齊時回傳 None"""
+    
+    if len(columns) == len(first_columns):
+        return list(first_columns)
+    elif len(columns) == len(first_columns) - 1:
+        return [col for col in first_columns if col != '來源資料夾']
+    return None
 
+def merge_file(source_dirs, output_dir, filename, log=print, output_format="csv", chunksize=None, dedup=False):
+    """合併單一檔案在各季度資料夾中的資料，回傳寫出的檔案路徑
+
+    dedup 為 True 時改用串流合併，並移除在多個季度中重複出現的交易。
+    """
+    
+    if chunksize or dedup:
+        return merge_file_streaming(source_dirs, output_dir, filename, log, output_format,
+                                    chunksize or ingestData.DEFAULT_CHUNKSIZE, dedup)
+    
+    log(f"正在處理: {filename}")
+    
+    outputs = []
+    dataframes = []
+    first_columns = None
+    
+    for idx, dir_name in enumerate(source_dirs):
+        file_path = Path(dir_name) / filename
+        if not file_path.exists():
+            continue
+
+        df = None
+        try:
+            read_args = source_read_args(idx)
+
+            encoding_used = ingestData.sniff_encoding(file_path)
+            with pipelineMetrics.stage("merge.parse", nbytes=os.path.getsize(file_path)):
                 try:
-                    df = pd.read_csv(file_path, encoding='utf-8', **read_args)
-                    encoding_used = 'utf-8'
+                    df = pd.read_csv(file_path, encoding=encoding_used, **read_args)
                 except UnicodeDecodeError:
-                    df = pd.read_csv(file_path, encoding='big5', **read_args)
+                    pipelineMetrics.count("merge.encoding_fallback")
                     encoding_used = 'big5'
-                
-                print(f"  從 {dir_name} ({encoding_used}) 讀取 {len(df)} 筆資料")
-                
-                if isinstance(df.columns, pd.MultiIndex):
-                    df.columns = ['_'.join(col).strip() for col in df.columns.values]
-
-                df['來源資料夾'] = dir_name
-                
-                if first_columns is None:
-                    first_columns = df.columns.tolist()
-                
-                dataframes.append(df)
-                
-            except Exception as e:
-                print(f"  讀取或處理 {file_path} 時發生錯誤: {e}")
+                    df = pd.read_csv(file_path, encoding=encoding_used, **read_args)
+            pipelineMetrics.add("merge.parse", rows=len(df))
+            
+            log(f"  從 {dir_name} ({encoding_used}) 讀取 {len(df)} 筆資料")
+            
+            flatten_columns(df)
 
-        if dataframes:
-            try:
-                if len(dataframes) > 1:
-                    for i in range(1, len(dataframes)):
-                        if len(dataframes[i].columns) == len(first_columns):
-                            dataframes[i].columns = first_columns
-                        elif len(dataframes[i].columns) == len(first_columns) - 1:
-                            dataframes[i].columns = [col for col in first_columns if col != '來源資料夾']
+            df['來源資料夾'] = Path(dir_name).name
+            
+            if first_columns is None:
+                first_columns = df.columns.tolist()
+            
+            dataframes.append(df)
+            
+        except Exception as e:
+            pipelineMetrics.count("merge.read_errors")
+            log(f"  讀取或處理 {file_path} 時發生錯誤: {e}")
+
+    if dataframes:
+        try:
+            if len(dataframes) > 1:
+                for i in range(1, len(dataframes)):
+                    aligned = align_columns(dataframes[i].columns, first_columns)
+                    if aligned is not None:
+                        dataframes[i].columns = aligned
 
+            with pipelineMetrics.stage("merge.concat", rows=sum(len(df) for df in dataframes)):
                 merged_df = pd.concat(dataframes, ignore_index=True)
-                
+            
+            if output_format in ("csv", "both"):
                 output_path = output_dir / filename
-                merged_df.to_csv(output_path, index=False, encoding='utf-8-sig')
-                
-                print(f"  合併完成，共 {len(merged_df)} 筆資料，儲存至 {output_path}")
-                
-            except Exception as e:
-                print(f"  合併 {filename} 時發生錯誤: {e}")
+                with pipelineMetrics.stage("merge.write", rows=len(merged_df)):
+                    merged_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+                pipelineMetrics.add("merge.write", nbytes=os.path.getsize(output_path))
+                outputs.append(output_path)
+                log(f"  合併完成，共 {len(merged_df)} 筆資料，儲存至 {output_path}")
+            
+            if output_format in ("parquet", "both"):
+                parquet_root = Path(output_dir).parent / columnarStore.PARQUET_ROOT
+                with pipelineMetrics.stage("merge.write_parquet", rows=len(merged_df)):
+                    output_path = columnarStore.write_partition(merged_df, parquet_root, Path(output_dir).name, filename)
+                outputs.append(output_path)
+                log(f"  合併完成，共 {len(merged_df)} 筆資料，儲存至 {output_path}")
+            
+        except Exception as e:
+            pipelineMetrics.count("merge.failed_files")
+            log(f"  合併 {filename} 時發生錯誤: {e}")
+            return []
+    else:
+        log(f"  沒有讀取到任何 {filename} 的有效資料")
+    
+    return outputs
+
+def promote_dtype(current, new):
+    """推算兩個欄位型別經 pd.concat 合併後的型別"""
+    
+    if current is None or current == new:
+        return new
+    if pd.api.types.is_bool_dtype(current) or pd.api.types.is_bool_dtype(new):
+        return np.dtype(object)
+    if pd.api.types.is_numeric_dtype(current) and pd.api.types.is_numeric_dtype(new):
+        return np.result_type(current, new)
+    return np.dtype(object)
+
+def text_columns(columns, dtypes):
+    """整份來源檔推斷為文字的欄位位置；逐塊讀取時這些欄位需固定讀為文字，
+    否則只含數字的區塊會被推斷為數值，失去 0821027 的前導零或 1.50 的尾端零"""
+    
+    return {position: str for position, col in enumerate(columns)
+            if not pd.api.types.is_numeric_dtype(dtypes[col])}
+
+def read_source_chunks(file_path, idx, encoding, chunksize, dtype=None):
+    """逐塊讀取單一來源檔，dtype 依欄位位置指定讀取型別"""
+    
+    reader = pd.read_csv(file_path, encoding=encoding, chunksize=chunksize, dtype=dtype, **source_read_args(idx))
+    with reader:
+        for chunk in reader:
+            yield flatten_columns(chunk)
+
+def row_keys(chunk, columns=None):
+    """計算每列的去重鍵，回傳 (鍵值, 是否以編號為鍵)
+
+    有編號的列以編號的雜湊為鍵，沒有編號時以整列正規化後的雜湊為鍵；
+    可視為數字的值一律轉為浮點數再轉文字，避免不同季度或不同區塊推斷出的型別不同而得到不同的雜湊。
+    columns 為對齊後的欄位名稱，用來在只有英文標題的來源中找到編號欄。
+    """
+    
+    normalized = pd.DataFrame(index=chunk.index)
+    for position, col in enumerate(chunk.columns):
+        values = chunk[col]
+        if pd.api.types.is_bool_dtype(values):
+            normalized[position] = values.astype(str)
+            continue
+        numbers = pd.to_numeric(values, errors='coerce').astype('float64')
+        normalized[position] = values.astype(str).str.strip().where(numbers.isna(), numbers.astype(str))
+    keys = pd.util.hash_pandas_object(normalized, index=False, hash_key=ROW_HASH_KEY).to_numpy()
+    
+    names = list(columns if columns is not None else chunk.columns)
+    serial_column = ingestData.find_column(names, SERIAL_KEY)
+    if serial_column is None:
+        return keys, np.zeros(len(chunk), dtype=bool)
+    
+    values = chunk.iloc[:, names.index(serial_column)]
+    serial = values.astype(str).str.strip()
+    has_serial = (values.notna() & (serial != '')).to_numpy()
+    serial_keys = pd.util.hash_pandas_object(serial, index=False, hash_key=SERIAL_HASH_KEY).to_numpy()
+    return np.where(has_serial, serial_keys, keys), has_serial
+
+def latest_rows(keys):
+    """每個鍵只保留最後出現的一列；來源依季度先後讀取，因此保留的是最新的季度"""
+    
+    keep = np.zeros(len(keys), dtype=bool)
+    _, last = np.unique(keys[::-1], return_index=True)
+    keep[len(keys) - 1 - last] = True
+    return keep
+
+def scan_source(file_path, idx, chunksize, dedup=False, align=None):
+    """第一次掃描來源檔：決定編碼並記錄筆數、欄位與各欄型別，去重時一併計算各列的鍵
+
+    align 將來源的欄位名稱轉為對齊後的名稱，供尋找編號欄使用。
+    """
+    
+    sniffed = ingestData.sniff_encoding(file_path)
+    for encoding in (sniffed, 'big5'):
+        try:
+            rows = 0
+            columns = None
+            dtypes = {}
+            keys = []
+            key_columns = None
+            for chunk in read_source_chunks(file_path, idx, encoding, chunksize):
+                if columns is None:
+                    columns = chunk.columns.tolist()
+                    key_columns = align(columns) if align else columns
+                rows += len(chunk)
+                for col, dtype in chunk.dtypes.items():
+                    dtypes[col] = promote_dtype(dtypes.get(col), dtype)
+                if dedup:
+                    keys.append(row_keys(chunk, key_columns))
+            return encoding, rows, columns, dtypes, keys
+        except UnicodeDecodeError:
+            if encoding == 'big5':
+                raise
+
+def merge_file_streaming(source_dirs, output_dir, filename, log=print, output_format="csv", chunksize=100_000,
+                         dedup=False):
+    """逐塊讀取並寫出合併結果，記憶體用量只與區塊大小有關
+
+    第一次掃描決定各來源的編碼、欄位以及與 pd.concat 相同的合併後型別，
+    第二次掃描才逐塊對齊欄位並附加到輸出檔，因此輸出內容與一次合併相同。
+    dedup 為 True 時第一次掃描另外記錄每列 8 bytes 的鍵，第二次掃描只寫出各鍵最新季度的那一列。
+    """
+    
+    log(f"正在處理: {filename}")
+    
+    sources = []
+    first_columns = None
+    all_columns = []
+    dtypes = {}
+    key_parts = []
+    
+    def align(columns):
+        if first_columns is None:
+            return columns
+        return (align_columns(columns + ['來源資料夾'], first_columns) or columns)[:len(columns)]
+    
+    for idx, dir_name in enumerate(source_dirs):
+        file_path = Path(dir_name) / filename
+        if not file_path.exists():
+            continue
+        
+        try:
+            with pipelineMetrics.stage("merge.scan", nbytes=os.path.getsize(file_path)):
+                encoding, rows, columns, source_dtypes, keys = scan_source(file_path, idx, chunksize, dedup, align)
+            pipelineMetrics.add("merge.scan", rows=rows)
+        except Exception as e:
+            pipelineMetrics.count("merge.read_errors")
+            log(f"  讀取或處理 {file_path} 時發生錯誤: {e}")
+            continue
+        if columns is None:
+            continue
+        
+        log(f"  從 {dir_name} ({encoding}) 讀取 {rows} 筆資料")
+        
+        column_dtypes = [source_dtypes[col] for col in columns] + [np.dtype(object)]
+        source_text = text_columns(columns, source_dtypes)
+        columns = columns + ['來源資料夾']
+        if first_columns is None:
+            first_columns = columns
         else:
-            print(f"  沒有讀取到任何 {filename} 的有效資料")
+            aligned = align_columns(columns, first_columns)
+            if aligned is not None:
+                columns = aligned
         
+        for col, dtype in zip(columns, column_dtypes):
+            if col not in dtypes:
+                all_columns.append(col)
+            dtypes[col] = promote_dtype(dtypes.get(col), dtype)
+        sources.append((dir_name, file_path, idx, encoding, columns, source_text))
+        key_parts.extend(keys)
+    
+    if not sources:
+        log(f"  沒有讀取到任何 {filename} 的有效資料")
+        return []
+    
+    keep = None
+    if dedup and key_parts:
+        keys = np.concatenate([k for k, _ in key_parts])
+        has_serial = np.concatenate([s for _, s in key_parts])
+        with pipelineMetrics.stage("merge.dedup", rows=len(keys)):
+            keep = latest_rows(keys)
+        dropped = ~keep
+        pipelineMetrics.count("merge.duplicates_dropped", int(dropped.sum()))
+        log(f"  移除 {int(dropped.sum())} 筆重複資料"
+            f"（依編號 {int((dropped & has_serial).sum())} 筆、依整列內容 {int((dropped & ~has_serial).sum())} 筆）")
+        del keys, has_serial, key_parts
+    
+    if len(sources) > 1:
+        for *_, columns, _ in sources:
+            for col in all_columns:
+                if col not in columns:
+                    dtypes[col] = promote_dtype(dtypes[col], np.dtype('float64'))
+    
+    outputs = []
+    csv_path = output_dir / filename
+    temp_path = csv_path.with_name(csv_path.name + '.tmp')
+    parquet_writer = None
+    if output_format in ("parquet", "both"):
+        parquet_root = Path(output_dir).parent / columnarStore.PARQUET_ROOT
+        parquet_writer = columnarStore.PartitionWriter(parquet_root, Path(output_dir).name, filename)
+    
+    try:
+        total = 0
+        position = 0
+        csv_file = open(temp_path, 'w', encoding='utf-8-sig', newline='') if output_format in ("csv", "both") else None
+        try:
+            if csv_file:
+                pd.DataFrame(columns=all_columns).to_csv(csv_file, index=False)
+            for dir_name, file_path, idx, encoding, columns, source_text in sources:
+                chunks = read_source_chunks(file_path, idx, encoding, chunksize, source_text)
+                for chunk in pipelineMetrics.iterate("merge.parse", chunks):
+                    if keep is not None:
+                        chunk_keep = keep[position:position + len(chunk)]
+                        position += len(chunk)
+                        chunk = chunk[chunk_keep]
+                        if chunk.empty:
+                            continue
+                    with pipelineMetrics.stage("merge.concat", rows=len(chunk)):
+                        chunk['來源資料夾'] = Path(dir_name).name
+                        chunk.columns = columns
+                        chunk = chunk.reindex(columns=all_columns)
+                        # 合併後為 object 的欄位保留各來源原本的值，不把數值轉成文字
+                        chunk = chunk.astype({col: dtypes[col] for col in all_columns
+                                              if dtypes[col] != object and chunk[col].dtype != dtypes[col]})
+                    total += len(chunk)
+                    if csv_file:
+                        with pipelineMetrics.stage("merge.write", rows=len(chunk)):
+                            chunk.to_csv(csv_file, header=False, index=False)
+                    if parquet_writer:
+                        with pipelineMetrics.stage("merge.write_parquet", rows=len(chunk)):
+                            parquet_writer.write(chunk)
+        finally:
+            if csv_file:
+                csv_file.close()
+        
+        if csv_file:
+            os.replace(temp_path, csv_path)
+            pipelineMetrics.add("merge.write", nbytes=os.path.getsize(csv_path))
+            outputs.append(csv_path)
+            log(f"  合併完成，共 {total} 筆資料，儲存至 {csv_path}")
+        if parquet_writer:
+            output_path = parquet_writer.close()
+            if output_path is not None:
+                outputs.append(output_path)
+                log(f"  合併完成，共 {total} 筆資料，儲存至 {output_path}")
+    except Exception as e:
+        if parquet_writer:
+            parquet_writer.abort()
+        if temp_path.exists():
+            temp_path.unlink()
+        log(f"  合併 {filename} 時發生錯誤: {e}")
+        return []
+    
+    return outputs
+
+def merge_year_data(source_dirs, output_dir, year, output_format="csv", filenames=None, **merge_options):
+    """合併單一年份的資料，回傳各檔案寫出的路徑"""
+    
+    all_files = list_csv_files(source_dirs) if filenames is None else filenames
+    
+    if not all_files:
+        print("  找不到任何CSV檔案，跳過...")
+        return {}
+
+    print(f"找到 {len(all_files)} 個不重複的檔案名稱")
+    
+    results = {}
+    for filename in sorted(all_files):
+        results[filename] = merge_file(source_dirs, output_dir, filename, output_format=output_format, **merge_options)
         print()
+    return results
+
+def prepare_year(year, root="."):
+    """在 root 下建立輸出資料夾並找出該年份存在的季度資料夾"""
+    
+    root = Path(root)
+    output_dir = root / str(year)
+    output_dir.mkdir(exist_ok=True)
+    
+    source_dirs = [str(root / f"{year}_0{quarter}") for quarter in range(2, 6)]
+    
+    existing_dirs = [d for d in source_dirs if os.path.exists(d)]
+    if not existing_dirs:
+        print(f"  找不到 {year} 年的任何季度資料夾，跳過...")
+    elif len(existing_dirs) < 4:
+        print(f"  {year} 年只找到 {len(existing_dirs)} 個季度資料夾: {existing_dirs}")
+    
+    return output_dir, existing_dirs
+
+def plan_year(manifest, year, existing_dirs, output_format, force=False, dedup=False, root="."):
+    """比對合併紀錄，找出該年份需要重新合併的檔案及其來源指紋"""
+    
+    pending = {}
+    for filename in sorted(list_csv_files(existing_dirs)):
+        key = mergeManifest.task_key(year, filename)
+        entry = manifest["outputs"].get(key)
+        sources = mergeManifest.source_fingerprints(existing_dirs, filename, entry, root)
+        if force or not mergeManifest.is_up_to_date(entry, existing_dirs, sources, output_format, dedup, root):
+            pending[filename] = sources
+    return pending
 
-def merge_all_years(start_year=104, end_year=113):
-    """合併所有年份的資料"""
+def _merge_file_task(source_dirs, output_dir, filename, output_format, merge_options):
+    """子行程執行的合併工作，將輸出訊息與效能指標收集後交回主行程"""
+    
+    messages = []
+    pipelineMetrics.METRICS.reset()
+    outputs = merge_file(source_dirs, output_dir, filename, log=messages.append, output_format=output_format,
+                         **merge_options)
+    return messages, outputs, pipelineMetrics.METRICS.snapshot()
+
+def merge_tasks_parallel(tasks, workers, output_format="csv", **merge_options):
+    """以多個行程平行合併各年份的每個檔案，回傳各工作寫出的路徑"""
+    
+    results = {}
+    if not tasks:
+        return results
+    
+    print(f"共 {len(tasks)} 個檔案，使用 {workers} 個行程平行處理")
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_merge_file_task, existing_dirs, output_dir, filename, output_format, merge_options): (year, filename)
+            for year, existing_dirs, output_dir, filename in tasks
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            year, filename = futures[future]
+            print(f"[{done}/{len(tasks)}] {year} 年 {filename}")
+            try:
+                messages, outputs, metrics = future.result()
+                pipelineMetrics.METRICS.merge(metrics)
+                for message in messages:
+                    print(message)
+                results[(year, filename)] = outputs
+            except Exception as e:
+                print(f"  合併 {filename} 時發生錯誤: {e}")
+            print()
+    return results
+
+def merge_all_years(start_year=104, end_year=113, workers=1, output_format="csv", rollup=True, force=False,
+                    chunksize=None, binary_cache=True, dedup=False, root="."):
+    """合併 root 下所有年份的資料，只重新合併來源有變動的檔案
+
+    各季度資料夾、輸出的年份資料夾、合併紀錄與彙總表都位於 root 之下；
+    指定 chunksize 時改用逐塊讀寫的串流合併，記憶體用量不隨檔案大小增加；
+    dedup 為 True 時移除在多個季度中重複出現的交易，只保留最新季度的版本。
+    """
     
     print("CSV檔案合併工具 - 批次處理版本")
     print("=" * 50)
     print(f"將處理 {start_year}年 到 {end_year}年 的所有資料")
     print("=" * 50)
     
-    for year in range(start_year, end_year + 1):
-        print(f"\n{'='*30}")
-        print(f"開始處理 {year} 年資料...")
-        print(f"{'='*30}")
-        
-        output_dir = Path(str(year))
-        output_dir.mkdir(exist_ok=True)
-        
-        source_dirs = [f"{year}_02", f"{year}_03", f"{year}_04", f"{year}_05"]
+    if output_format in ("parquet", "both"):
+        columnarStore.require_pyarrow()
+    
+    root = Path(root)
+    manifest_path = root / mergeManifest.MANIFEST_FILE
+    manifest = mergeManifest.load_manifest(manifest_path)
+    years = range(start_year, end_year + 1)
+    active_keys = set()
+    changed = 0
+    
+    try:
+        tasks = []
+        for year in years:
+            if workers <= 1:
+                print(f"\n{'='*30}")
+                print(f"開始處理 {year} 年資料...")
+                print(f"{'='*30}")
+            
+            output_dir, existing_dirs = prepare_year(year, root)
+            if not existing_dirs:
+                continue
+            
+            active_keys.update(mergeManifest.task_key(year, f) for f in list_csv_files(existing_dirs))
+            pending = plan_year(manifest, year, existing_dirs, output_format, force, dedup, root)
+            skipped = len(list_csv_files(existing_dirs)) - len(pending)
+            if skipped:
+                pipelineMetrics.count("merge.files_skipped", skipped)
+                print(f"  {year} 年有 {skipped} 個檔案來源未變動，略過")
+            
+            if workers > 1:
+                tasks.extend((year, existing_dirs, output_dir, filename, pending[filename]) for filename in pending)
+                continue
+            
+            if pending:
+                results = merge_year_data(existing_dirs, output_dir, year, output_format, filenames=list(pending),
+                                          chunksize=chunksize, dedup=dedup)
+                for filename, outputs in results.items():
+                    if outputs:
+                        mergeManifest.record(manifest, mergeManifest.task_key(year, filename), existing_dirs,
+                                             pending[filename], outputs, output_format, dedup=dedup, root=root)
+                        changed += 1
+                mergeManifest.save_manifest(manifest, manifest_path)
+            print(f" {year} 年資料處理完成")
         
-        existing_dirs = [d for d in source_dirs if os.path.exists(d)]
-        if not existing_dirs:
-            print(f"  找不到 {year} 年的任何季度資料夾，跳過...")
-            continue
-        elif len(existing_dirs) < 4:
-            print(f"  {year} 年只找到 {len(existing_dirs)} 個季度資料夾: {existing_dirs}")
+        if workers > 1:
+            results = merge_tasks_parallel([task[:4] for task in tasks], workers, output_format, chunksize=chunksize,
+                                           dedup=dedup)
+            for year, existing_dirs, output_dir, filename, sources in tasks:
+                outputs = results.get((year, filename))
+                if outputs:
+                    mergeManifest.record(manifest, mergeManifest.task_key(year, filename), existing_dirs,
+                                         sources, outputs, output_format, dedup=dedup, root=root)
+                    changed += 1
         
-        merge_year_data(existing_dirs, output_dir, year)
-        print(f" {year} 年資料處理完成")
+        changed += len(mergeManifest.remove_stale(manifest, active_keys, set(years), root=root))
+    finally:
+        mergeManifest.save_manifest(manifest, manifest_path)
+    
+    if rollup and output_format in ("csv", "both"):
+        if changed or force or not (root / buildRollup.ROLLUP_FILE).exists():
+            print(f"\n{'='*30}")
+            print("建立行政區每月單價彙總表...")
+            with pipelineMetrics.stage("rollup"):
+                buildRollup.build_rollup(root)
+        else:
+            print("\n所有來源皆未變動，沿用既有的行政區每月單價彙總表")
+    
+    if binary_cache and output_format in ("csv", "both"):
+        if changed or force or not (root / binaryCache.CACHE_DIR / binaryCache.INDEX_FILE).exists():
+            print(f"\n{'='*30}")
+            print("建立二進位欄位快取...")
+            with pipelineMetrics.stage("binary_cache"):
+                binaryCache.build_cache(root)
 
 if __name__ == "__main__":
-    merge_all_years(104, 113)
-    print("\n 所有年份合併完成") 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="合併各季度的實價登錄資料")
+    parser.add_argument("--root", default=".", help="各季度資料夾所在的資料夾，輸出也寫在此處")
+    parser.add_argument("--start-year", type=int, default=104)
+    parser.add_argument("--end-year", type=int, default=113)
+    parser.add_argument("--workers", type=int, default=1, help="平行處理的行程數，1 為逐一處理")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                        help="輸出格式：csv、依年份與縣市分區的 parquet，或兩者皆輸出")
+    parser.add_argument("--no-rollup", action="store_true", help="合併後不重建行政區每月單價彙總表")
+    parser.add_argument("--force", action="store_true", help="忽略合併紀錄，重新合併所有檔案")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="串流合併時每次讀取的筆數，未指定時一次讀入整個檔案")
+    parser.add_argument("--no-binary-cache", action="store_true", help="合併後不重建二進位欄位快取")
+    parser.add_argument("--metrics", help="將各階段的耗時、筆數與記憶體寫入此 JSON 檔")
+    parser.add_argument("--profile", help="以 cProfile 記錄整個合併過程並寫入此檔")
+    parser.add_argument("--dedup", action="store_true",
+                        help="以編號（沒有編號時以整列內容）移除多個季度重複的交易，只保留最新季度的版本")
+    args = parser.parse_args()
+    
+    with pipelineMetrics.profile(args.profile):
+        merge_all_years(args.start_year, args.end_year, workers=args.workers, output_format=args.format,
+                        rollup=not args.no_rollup, force=args.force, chunksize=args.chunksize,
+                        binary_cache=not args.no_binary_cache, dedup=args.dedup, root=args.root)
+    if args.metrics:
+        pipelineMetrics.METRICS.write(args.metrics)
+    print("\n 所有年份合併完成")
\ No newline at end of file
@@ -0,0 +1,152 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+
+MANIFEST_FILE = "merge_manifest.json"
+MANIFEST_VERSION = 1
+# 各輸出格式寫出的檔案類型
+FORMAT_SUFFIXES = {"csv": (".csv",), "parquet": (".parquet",), "both": (".csv", ".parquet")}
+
+def empty_manifest():
+    """建立空白的合併紀錄"""
+
+    return {"version": MANIFEST_VERSION, "outputs": {}}
+
+def load_manifest(path=MANIFEST_FILE):
+    """讀取合併紀錄，不存在或版本不符時回傳空白紀錄"""
+
+    path = Path(path)
+    if not path.exists():
+        return empty_manifest()
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  無法讀取合併紀錄 {path}，將重新建立: {e}")
+        return empty_manifest()
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+    return manifest
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    """寫入合併紀錄，先寫暫存檔再取代以免中斷時留下損毀的檔案"""
+
+    path = Path(path)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+def relative_path(path, root="."):
+    """紀錄中的路徑一律相對於 root，與執行時的工作目錄無關；不在 root 之下時保留絕對路徑"""
+
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(Path(root).resolve()).as_posix()
+    except ValueError:
+        return str(path)
+
+def resolve_path(path, root="."):
+    """將紀錄中的路徑還原為可開啟的路徑"""
+
+    return Path(root) / path
+
+def written_by(path, output_format):
+    """輸出檔是否屬於此輸出格式會寫出的檔案"""
+
+    return Path(path).suffix in FORMAT_SUFFIXES[output_format]
+
+def task_key(year, filename):
+    """合併工作在紀錄中的鍵值"""
+
+    return f"{year}/{filename}"
+
+def hash_file(path, chunk_size=1 << 20):
+    """計算檔案內容的 SHA-256"""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint(path, previous=None, root="."):
+    """記錄來源檔的大小、修改時間與內容雜湊；大小與時間未變時沿用舊的雜湊"""
+
+    stat = os.stat(path)
+    if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        sha256 = previous["sha256"]
+    else:
+        sha256 = hash_file(path)
+    return {"path": relative_path(path, root), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+
+def source_fingerprints(source_dirs, filename, entry=None, root="."):
+    """取得單一合併工作所有來源檔的指紋"""
+
+    previous = {s["path"]: s for s in entry["sources"]} if entry else {}
+    sources = []
+    for dir_name in source_dirs:
+        path = Path(dir_name) / filename
+        if path.exists():
+            sources.append(fingerprint(path, previous.get(relative_path(path, root)), root))
+    return sources
+
+def is_up_to_date(entry, source_dirs, sources, output_format, dedup=False, root="."):
+    """判斷先前的輸出是否仍對應目前的來源檔、輸出格式與去重設定"""
+
+    if entry is None:
+        return False
+    source_dirs = [relative_path(d, root) for d in source_dirs]
+    if entry.get("format") != output_format or entry.get("source_dirs") != source_dirs:
+        return False
+    if entry.get("dedup", False) != dedup:
+        return False
+    if [(s["path"], s["sha256"]) for s in entry["sources"]] != [(s["path"], s["sha256"]) for s in sources]:
+        return False
+    outputs = [p for p in entry["outputs"] if written_by(p, output_format)]
+    return bool(outputs) and all(resolve_path(p, root).exists() for p in outputs)
+
+def record(manifest, key, source_dirs, sources, outputs, output_format, log=print, dedup=False, root="."):
+    """記錄一次成功的合併，並刪除先前以相同格式產生但這次不再輸出的檔案
+
+    其他格式的輸出檔（例如改以 Parquet 合併時既有的 CSV）保留下來並繼續記錄，來源刪除時才一併移除。
+    """
+
+    previous = manifest["outputs"].get(key)
+    outputs = [relative_path(p, root) for p in outputs]
+    if previous:
+        for path in previous["outputs"]:
+            if path in outputs:
+                continue
+            if not written_by(path, output_format):
+                outputs.append(path)
+            elif resolve_path(path, root).exists():
+                os.remove(resolve_path(path, root))
+                log(f"  移除過期的輸出檔 {path}")
+
+    manifest["outputs"][key] = {
+        "format": output_format,
+        "source_dirs": [relative_path(d, root) for d in source_dirs],
+        "sources": sources,
+        "outputs": outputs,
+        "dedup": dedup,
+    }
+
+def remove_stale(manifest, active_keys, years, log=print, root="."):
+    """刪除來源檔已不存在的輸出檔，只處理本次執行範圍內的年份"""
+
+    removed = []
+    for key, entry in list(manifest["outputs"].items()):
+        year = int(key.split('/', 1)[0])
+        if year not in years or key in active_keys:
+            continue
+        for path in entry["outputs"]:
+            if resolve_path(path, root).exists():
+                os.remove(resolve_path(path, root))
+                log(f"  來源已刪除，移除輸出檔 {path}")
+        del manifest["outputs"][key]
+        removed.append(key)
+    return removed
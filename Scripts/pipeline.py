@@ -0,0 +1,435 @@
+import io
+import os
+import time
+import argparse
+import contextlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+import binaryCache
+import buildPanel
+import buildRollup
+import ingestData
+import mergeData
+import mergeManifest
+import pipelineMetrics
+import quantileSketch
+from cityCodes import city_code
+
+DATA_DIR = Path("Data")
+HOUSE_DIR = "MergedHousePricingData"
+CLEANED_DIR = "people_cleanedData"
+RAW_DIR = "people_rawData"
+
+STAGES = ("scrape", "clean", "merge", "aggregate")
+RAW_EXTENSIONS = (".csv", ".xls", ".xlsx")
+DISTRICT_COLUMN = "區域別"
+NET_MIGRATION_KEY = "淨遷徙"
+
+class Task:
+    """DAG 中的一個工作：action(*args) 在子程序中執行，after(result) 在主程序中處理結果"""
+
+    def __init__(self, name, stage, action, args=(), deps=(), up_to_date=False, after=None):
+        self.name = name
+        self.stage = stage
+        self.action = action
+        self.args = args
+        self.deps = list(deps)
+        self.up_to_date = up_to_date
+        self.after = after
+
+def newest_mtime(paths):
+    """一組檔案中最新的修改時間，沒有檔案時為 0"""
+
+    return max((os.stat(p).st_mtime_ns for p in paths), default=0)
+
+def is_newer(output, inputs):
+    """輸出檔存在且不舊於所有輸入檔"""
+
+    return os.path.exists(output) and os.stat(output).st_mtime_ns >= newest_mtime(inputs)
+
+def expected_months(year, today=None):
+    """儀表板上該民國年已公布的月份數，當年度只到上個月"""
+
+    today = today or time.localtime()
+    current = today.tm_year - 1911
+    if year < current:
+        return 12
+    if year > current:
+        return 0
+    return today.tm_mon - 1
+
+def raw_name(code, year, month):
+    """與 getData.py 相同的原始檔名：{代碼}_{年}{月}"""
+
+    return f"{code}_{year:02d}{month:02d}"
+
+def raw_files(raw_dir, code, year):
+    """某縣市某年已下載的每月原始檔，回傳 {月: 路徑}"""
+
+    files = {}
+    for month in range(1, 13):
+        for path in Path(raw_dir).glob(f"{raw_name(code, year, month)}.*"):
+            if path.suffix.lower() in RAW_EXTENSIONS:
+                files[month] = path
+    return files
+
+def city_dir(cleaned_dir, code):
+    """縣市在清理後資料夾中的子資料夾，沿用既有的 {代碼}_{名稱}"""
+
+    existing = sorted(d for d in Path(cleaned_dir).glob(f"{code}_*") if d.is_dir())
+    if existing:
+        return existing[0]
+    return Path(cleaned_dir) / f"{code}_{city_code[code].replace('臺', '台')}"
+
+def cleaned_months(path):
+    """清理後的年度表已有的月份數"""
+
+    if not path.exists():
+        return 0
+    header = pd.read_csv(path, encoding=ingestData.sniff_encoding(path), nrows=0)
+    return len(header.columns) - 1
+
+def scrape_city_year(raw_dir, code, year, months, headless=True):
+    """以一個瀏覽器下載某縣市某年缺少的月份，完成的檔案移到 raw_dir"""
+
+    import getData
+
+    download_dir = (Path(raw_dir) / f".scrape_{code}_{year}").resolve()
+    download_dir.mkdir(parents=True, exist_ok=True)
+    driver = getData.create_driver(str(download_dir), headless)
+    watcher = getData.DownloadWatcher(str(download_dir))
+    failed = []
+    try:
+        for month in months:
+            downloaded = getData.download_month(driver, watcher, code, city_code[code], year, month)
+            if downloaded:
+                os.replace(downloaded, Path(raw_dir) / os.path.basename(downloaded))
+            else:
+                failed.append(month)
+    finally:
+        watcher.stop()
+        driver.quit()
+
+    if failed:
+        raise RuntimeError(f"{city_code[code]} {year} 年 {', '.join(map(str, failed))} 月下載失敗")
+    download_dir.rmdir()
+
+def read_raw_month(path):
+    """讀取儀表板下載的單月統計表，回傳以區域為索引的淨遷徙人數"""
+
+    if path.suffix.lower() == ".csv":
+        df = pd.read_csv(path, encoding=ingestData.sniff_encoding(path), dtype=str)
+    else:
+        df = pd.read_excel(path, dtype=str)
+
+    district = df.iloc[:, 0].str.strip()
+    # 統計表可能同時有遷入、遷出等欄位，優先取名稱含「淨遷徙」的欄位
+    value_columns = [c for c in df.columns[1:] if NET_MIGRATION_KEY in str(c)]
+    values = ingestData.to_number(df[value_columns[0] if value_columns else df.columns[-1]])
+
+    keep = district.notna() & (district != "")
+    series = pd.Series(values[keep].to_numpy(), index=district[keep].to_numpy())
+    return series[~series.index.duplicated()]
+
+def clean_city_year(raw_dir, output_path, code, year):
+    """將某縣市某年的每月原始檔整理成與 people_cleanedData 相同的 (區域 × 月份) 淨遷徙表"""
+
+    files = raw_files(raw_dir, code, year)
+    months = []
+    while len(months) + 1 in files:
+        months.append(len(months) + 1)
+    if not months:
+        raise FileNotFoundError(f"找不到 {city_code[code]} {year} 年 1 月的原始檔")
+
+    columns = {f"{month}月": read_raw_month(files[month]) for month in months}
+    # 區域依第一次出現的順序排列
+    order = list(dict.fromkeys(district for series in columns.values() for district in series.index))
+    table = pd.concat(columns, axis=1).reindex(order).round().astype("Int64")
+    table.index.name = DISTRICT_COLUMN
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = output_path.with_name(output_path.name + ".tmp")
+    table.reset_index().to_csv(temp_path, index=False, encoding="utf-8-sig")
+    os.replace(temp_path, output_path)
+    print(f"{output_path} 完成，共 {len(table)} 個區域、{len(months)} 個月")
+
+def merge_city_year(source_dirs, output_dir, filenames, merge_options):
+    """合併某縣市某年的實價登錄檔，回傳 {檔名: 輸出路徑}"""
+
+    return {filename: mergeData.merge_file(source_dirs, output_dir, filename, **merge_options)
+            for filename in filenames}
+
+def scrape_tasks(cities, years, raw_dir, cleaned_dir, headless):
+    """已公布但原始檔與清理後的表都不完整的 (縣市, 年) 才需要下載"""
+
+    tasks = []
+    for code in cities:
+        for year in years:
+            expected = expected_months(year)
+            if not expected:
+                continue
+            have = raw_files(raw_dir, code, year)
+            missing = [month for month in range(1, expected + 1) if month not in have]
+            complete = cleaned_months(city_dir(cleaned_dir, code) / f"{code}_{year}.csv") >= expected
+            tasks.append(Task(f"scrape:{code}:{year}", "scrape", scrape_city_year,
+                              (str(raw_dir), code, year, missing, headless), up_to_date=complete or not missing))
+    return tasks
+
+def clean_tasks(cities, years, raw_dir, cleaned_dir, scraping):
+    """原始檔比清理後的表新，或上游會重新下載時才需要清理
+
+    沒有原始檔且不會下載時（例如只有既有的清理後的表）不建立清理工作，--force 也不會嘗試重建。
+    """
+
+    tasks = []
+    for code in cities:
+        for year in years:
+            output_path = city_dir(cleaned_dir, code) / f"{code}_{year}.csv"
+            inputs = list(raw_files(raw_dir, code, year).values())
+            # 與 scrape_tasks 相同的條件：清理後的表不完整時才會下載
+            downloading = scraping and cleaned_months(output_path) < expected_months(year)
+            if not inputs and not downloading:
+                if not output_path.exists():
+                    print(f"  {city_code[code]} {year} 年沒有原始檔也沒有清理後的表，略過")
+                continue
+            deps = [f"scrape:{code}:{year}"] if scraping else []
+            tasks.append(Task(f"clean:{code}:{year}", "clean", clean_city_year,
+                              (str(raw_dir), str(output_path), code, year), deps,
+                              up_to_date=output_path.exists() and is_newer(output_path, inputs)))
+    return tasks
+
+def merge_tasks(cities, years, house_dir, manifest, manifest_path, force, merge_options, dry_run=False):
+    """依合併紀錄為每個 (年, 縣市) 建立合併工作，並移除來源已刪除的輸出檔（dry_run 時只檢查）"""
+
+    tasks = []
+    active_keys = set()
+    for year in years:
+        output_dir, existing_dirs = mergeData.prepare_year(year, house_dir)
+        if not existing_dirs:
+            continue
+        filenames = mergeData.list_csv_files(existing_dirs)
+        active_keys.update(mergeManifest.task_key(year, f) for f in filenames)
+        pending = mergeData.plan_year(manifest, year, existing_dirs, "csv", force, merge_options.get("dedup", False),
+                                      house_dir)
+
+        for code in cities:
+            city_files = sorted(f for f in filenames if f.startswith(f"{code}_lvr_land_"))
+            if not city_files:
+                continue
+            city_pending = {f: pending[f] for f in city_files if f in pending}
+
+            def after(results, year=year, existing_dirs=existing_dirs, city_pending=city_pending):
+                failed = []
+                for filename, outputs in results.items():
+                    if outputs:
+                        mergeManifest.record(manifest, mergeManifest.task_key(year, filename), existing_dirs,
+                                             city_pending[filename], outputs, "csv",
+                                             dedup=merge_options.get("dedup", False), root=house_dir)
+                    else:
+                        failed.append(filename)
+                mergeManifest.save_manifest(manifest, manifest_path)
+                if failed:
+                    raise RuntimeError(f"{', '.join(failed)} 合併失敗")
+
+            tasks.append(Task(f"merge:{year}:{code}", "merge", merge_city_year,
+                              (existing_dirs, output_dir, list(city_pending), merge_options),
+                              up_to_date=not city_pending, after=after))
+
+    if dry_run:
+        return tasks, any(int(key.split('/', 1)[0]) in years and key not in active_keys
+                          for key in manifest["outputs"])
+    removed = mergeManifest.remove_stale(manifest, active_keys, set(years), root=house_dir)
+    if removed:
+        mergeManifest.save_manifest(manifest, manifest_path)
+    return tasks, bool(removed)
+
+def aggregate_tasks(house_dir, cleaned_dir, merge_names, clean_names, stale, binary_cache=True):
+    """彙總表讀取所有年份或縣市，上游任何一個工作執行過就重建"""
+
+    house_dir = Path(house_dir)
+    merged_files = list(house_dir.glob("[0-9]*/*_lvr_land_*.csv"))
+    cleaned_files = list(Path(cleaned_dir).glob("*_*/*.csv"))
+
+    rollup_path = house_dir / buildRollup.ROLLUP_FILE
+    tasks = [Task("aggregate:rollup", "aggregate", buildRollup.build_rollup, (str(house_dir),), merge_names,
+                  up_to_date=not stale and is_newer(rollup_path, merged_files))]
+    quantile_path = house_dir / quantileSketch.QUANTILE_FILE
+    tasks.append(Task("aggregate:quantiles", "aggregate", quantileSketch.build_quantiles, (str(house_dir),),
+                      merge_names, up_to_date=not stale and is_newer(quantile_path, merged_files)))
+    if binary_cache:
+        index_path = house_dir / binaryCache.CACHE_DIR / binaryCache.INDEX_FILE
+        tasks.append(Task("aggregate:binary_cache", "aggregate", binaryCache.build_cache, (str(house_dir),),
+                          merge_names, up_to_date=not stale and is_newer(index_path, merged_files)))
+    panel_path = Path(cleaned_dir) / buildPanel.PANEL_FILE
+    tasks.append(Task("aggregate:panel", "aggregate", buildPanel.build_panel, (str(cleaned_dir),), clean_names,
+                      up_to_date=is_newer(panel_path, cleaned_files)))
+    return tasks
+
+def build_graph(data_dir=DATA_DIR, cities=None, start_year=104, end_year=113, stages=STAGES, force=False,
+                house_dir=None, cleaned_dir=None, raw_dir=None, headless=True, binary_cache=True,
+                chunksize=None, dedup=False, dry_run=False):
+    """建立 scrape → clean → merge → aggregate 的工作清單，工作排在其相依工作之後"""
+
+    data_dir = Path(data_dir)
+    house_dir = Path(house_dir or data_dir / HOUSE_DIR)
+    cleaned_dir = Path(cleaned_dir or data_dir / CLEANED_DIR)
+    raw_dir = Path(raw_dir or data_dir / RAW_DIR)
+    cities = [code for code in (cities or city_code) if code in city_code]
+    years = range(start_year, end_year + 1)
+
+    tasks = []
+    if "scrape" in stages:
+        raw_dir.mkdir(parents=True, exist_ok=True)
+        tasks += scrape_tasks(cities, years, raw_dir, cleaned_dir, headless)
+    if "clean" in stages:
+        tasks += clean_tasks(cities, years, raw_dir, cleaned_dir, "scrape" in stages)
+
+    stale = False
+    if "merge" in stages:
+        manifest_path = house_dir / mergeManifest.MANIFEST_FILE
+        manifest = mergeManifest.load_manifest(manifest_path)
+        merge_options = {"chunksize": chunksize, "dedup": dedup}
+        merged, stale = merge_tasks(cities, years, house_dir, manifest, manifest_path, force, merge_options,
+                                    dry_run)
+        tasks += merged
+
+    if "aggregate" in stages:
+        merge_names = [task.name for task in tasks if task.stage == "merge"]
+        clean_names = [task.name for task in tasks if task.stage == "clean"]
+        tasks += aggregate_tasks(house_dir, cleaned_dir, merge_names, clean_names, stale, binary_cache)
+    return tasks
+
+def plan(tasks, force=False):
+    """找出需要執行的工作：本身不是最新，或任何上游工作需要執行；force 不重新下載已有的原始檔"""
+
+    to_run = set()
+    for task in tasks:
+        if (force and task.stage != "scrape") or not task.up_to_date or any(d in to_run for d in task.deps):
+            to_run.add(task.name)
+    return to_run
+
+def _run_action(stage, action, args):
+    """子程序執行單一工作，將輸出訊息與效能指標收集後交回主程序"""
+
+    output = io.StringIO()
+    pipelineMetrics.METRICS.reset()
+    try:
+        with contextlib.redirect_stdout(output), pipelineMetrics.stage(f"pipeline.{stage}"):
+            result = action(*args)
+        ok = True
+    except Exception as e:
+        result = f"{type(e).__name__}: {e}"
+        ok = False
+    return ok, result, output.getvalue(), pipelineMetrics.METRICS.snapshot()
+
+def run(tasks, to_run, workers=1, limits=None, verbose=False):
+    """依相依關係在行程池中平行執行工作，上游失敗的工作不執行，回傳 {工作: 狀態}"""
+
+    limits = limits or {}
+    status = {task.name: "skipped" for task in tasks if task.name not in to_run}
+    pending = [task for task in tasks if task.name in to_run]
+    running = {}
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        while pending or running:
+            for task in list(pending):
+                deps = [status.get(d) for d in task.deps if d in to_run]
+                if any(s in ("failed", "blocked") for s in deps):
+                    status[task.name] = "blocked"
+                    pending.remove(task)
+                    print(f"  ✗ {task.name} 的上游工作失敗，不執行")
+                    continue
+                if len(running) >= workers or any(s not in ("done", "skipped") for s in deps):
+                    continue
+                limit = limits.get(task.stage)
+                if limit and sum(t.stage == task.stage for t, _ in running.values()) >= limit:
+                    continue
+                future = executor.submit(_run_action, task.stage, task.action, task.args)
+                running[future] = (task, time.perf_counter())
+                pending.remove(task)
+
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task, start = running.pop(future)
+                done += 1
+                ok, result, output, metrics = False, None, "", None
+                try:
+                    ok, result, output, metrics = future.result()
+                    pipelineMetrics.METRICS.merge(metrics)
+                    if ok and task.after:
+                        task.after(result)
+                except Exception as e:
+                    ok, result = False, f"{type(e).__name__}: {e}"
+
+                status[task.name] = "done" if ok else "failed"
+                mark = "✓" if ok else "✗"
+                print(f"[{done}/{len(to_run)}] {mark} {task.name} ({time.perf_counter() - start:.1f} 秒)")
+                if verbose or not ok:
+                    for line in output.splitlines():
+                        print(f"    {line}")
+                if not ok:
+                    print(f"    {result}")
+    return status
+
+def print_plan(tasks, to_run):
+    """列出各階段需要執行與略過的工作數"""
+
+    for stage in STAGES:
+        names = [task.name for task in tasks if task.stage == stage]
+        if not names:
+            continue
+        selected = [name for name in names if name in to_run]
+        print(f"  {stage:<9} 執行 {len(selected):>4} 個，最新而略過 {len(names) - len(selected):>4} 個")
+        if 0 < len(selected) <= 20:
+            print(f"            {' '.join(selected)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以相依關係排程下載、清理、合併與彙總，只執行需要更新的工作")
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help="資料根目錄，其他資料夾預設位於此處")
+    parser.add_argument("--house-dir", help=f"各季度實價登錄資料夾所在處，預設為 {{data-dir}}/{HOUSE_DIR}")
+    parser.add_argument("--cleaned-dir", help=f"清理後的遷徙資料，預設為 {{data-dir}}/{CLEANED_DIR}")
+    parser.add_argument("--raw-dir", help=f"儀表板下載的每月原始檔，預設為 {{data-dir}}/{RAW_DIR}")
+    parser.add_argument("--cities", default="".join(city_code), help="只處理這些縣市代碼，例如 B 或 ABF")
+    parser.add_argument("--start-year", type=int, default=104)
+    parser.add_argument("--end-year", type=int, default=113)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="要納入的階段")
+    parser.add_argument("--force", action="store_true", help="重建選定範圍的清理、合併與彙總（不重新下載）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="同時執行的工作數")
+    parser.add_argument("--browsers", type=int, default=2, help="同時開啟的瀏覽器數上限")
+    parser.add_argument("--show-browser", action="store_true", help="下載時顯示瀏覽器視窗")
+    parser.add_argument("--chunksize", type=int, help="以串流合併並指定每塊筆數")
+    parser.add_argument("--dedup", action="store_true", help="合併時移除多個季度重複的交易")
+    parser.add_argument("--no-binary-cache", action="store_true", help="不建立二進位欄位快取")
+    parser.add_argument("--dry-run", action="store_true", help="只列出需要執行的工作")
+    parser.add_argument("--verbose", action="store_true", help="顯示每個工作的輸出訊息")
+    parser.add_argument("--metrics", help="將各階段的耗時寫入此 JSON 檔")
+    parser.add_argument("--profile", help="以 cProfile 記錄主程序並寫入此檔")
+    args = parser.parse_args()
+
+    with pipelineMetrics.profile(args.profile):
+        tasks = build_graph(args.data_dir, args.cities, args.start_year, args.end_year, args.stages, args.force,
+                            args.house_dir, args.cleaned_dir, args.raw_dir, headless=not args.show_browser,
+                            binary_cache=not args.no_binary_cache, chunksize=args.chunksize, dedup=args.dedup,
+                            dry_run=args.dry_run)
+        to_run = plan(tasks, args.force)
+        print(f"共 {len(tasks)} 個工作，其中 {len(to_run)} 個需要執行")
+        print_plan(tasks, to_run)
+
+        status = {}
+        if to_run and not args.dry_run:
+            start = time.time()
+            status = run(tasks, to_run, args.workers, {"scrape": args.browsers}, args.verbose)
+            counts = {s: list(status.values()).count(s) for s in ("done", "skipped", "failed", "blocked")}
+            print(f"\n完成 {counts['done']} 個，略過 {counts['skipped']} 個，失敗 {counts['failed']} 個，"
+                  f"因上游失敗未執行 {counts['blocked']} 個，耗時 {time.time() - start:.1f} 秒")
+    if args.metrics:
+        pipelineMetrics.METRICS.write(args.metrics)
+    if any(s in ("failed", "blocked") for s in status.values()):
+        raise SystemExit(1)
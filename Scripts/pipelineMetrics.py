@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import platform
+import contextlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PERCENTILES = (50, 90, 99)
+
+def peak_rss_mb(who=None):
+    """程序（或已結束的子程序）的最高常駐記憶體 (MB)，無法取得時回傳 None"""
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # Linux 的單位為 KB，macOS 為 bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def peak_child_rss_mb():
+    """已結束的子程序（例如行程池的工作程序）中最大者的最高常駐記憶體 (MB)，沒有子程序時回傳 None"""
+
+    if resource is None:
+        return None
+    return peak_rss_mb(resource.RUSAGE_CHILDREN) or None
+
+class Metrics:
+    """記錄各階段的耗時、筆數、位元組數與計數，可在多個程序間合併"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.durations = defaultdict(list)
+        self.rows = Counter()
+        self.bytes = Counter()
+        self.counters = Counter()
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=0, nbytes=0):
+        """量測一段程式的耗時；rows 與 nbytes 可在結束後以 add 補上"""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name].append(time.perf_counter() - start)
+            self.rows[name] += rows
+            self.bytes[name] += nbytes
+
+    def iterate(self, name, iterable):
+        """逐項量測取得下一個元素的耗時，例如逐塊讀取 CSV 時的解析時間"""
+
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.durations[name].append(time.perf_counter() - start)
+            self.rows[name] += len(item) if hasattr(item, "__len__") else 0
+            yield item
+
+    def add(self, name, rows=0, nbytes=0):
+        """為某個階段累計處理的筆數與位元組數"""
+
+        self.rows[name] += rows
+        self.bytes[name] += nbytes
+
+    def count(self, name, n=1):
+        """累計重試、失敗等事件的次數"""
+
+        self.counters[name] += n
+
+    def snapshot(self):
+        """可序列化的原始資料，供子程序交回主程序"""
+
+        return {
+            "durations": {name: list(values) for name, values in self.durations.items()},
+            "rows": dict(self.rows),
+            "bytes": dict(self.bytes),
+            "counters": dict(self.counters),
+        }
+
+    def merge(self, snapshot):
+        """合併子程序交回的原始資料"""
+
+        for name, values in snapshot["durations"].items():
+            self.durations[name].extend(values)
+        self.rows.update(snapshot["rows"])
+        self.bytes.update(snapshot["bytes"])
+        self.counters.update(snapshot["counters"])
+
+    def summary(self):
+        """各階段的次數、總耗時、延遲百分位數與處理速率"""
+
+        stages = {}
+        for name, values in self.durations.items():
+            values = np.asarray(values)
+            total = float(values.sum())
+            stage = {
+                "count": len(values),
+                "total_s": total,
+                "mean_s": float(values.mean()),
+                "max_s": float(values.max()),
+            }
+            for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                stage[f"p{q}_s"] = float(value)
+            if self.rows[name]:
+                stage["rows"] = int(self.rows[name])
+                stage["rows_per_s"] = self.rows[name] / total if total else None
+            if self.bytes[name]:
+                stage["bytes"] = int(self.bytes[name])
+                stage["mb_per_s"] = self.bytes[name] / 1e6 / total if total else None
+            stages[name] = stage
+
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_s": time.time() - self.started,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_child_rss_mb": peak_child_rss_mb(),
+            "python": platform.python_version(),
+            "argv": sys.argv,
+            "stages": stages,
+            "counters": dict(self.counters),
+        }
+
+    def write(self, path):
+        """將摘要寫入 JSON 檔"""
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, path)
+        print(f"效能指標已寫入 {path}")
+
+# 各模組共用的紀錄
+METRICS = Metrics()
+stage = METRICS.stage
+iterate = METRICS.iterate
+add = METRICS.add
+count = METRICS.count
+
+@contextlib.contextmanager
+def profile(path=None):
+    """指定 path 時以 cProfile 記錄這段程式，結果可用 snakeviz 或 flameprof 轉為火焰圖"""
+
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"cProfile 結果已寫入 {path}")
@@ -0,0 +1,316 @@
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import buildRollup
+import ingestData
+
+SKETCH_FILE = "price_sketches.npz"
+QUANTILE_FILE = "price_quantiles.csv"
+QUANTILE_COLUMNS = ["city", "district", "date", "count", "p10", "p25", "median", "p75", "p90", "iqr", "rank_error"]
+
+DEFAULT_K = 200
+CAPACITY_RATIO = 2 / 3
+MIN_CAPACITY = 8
+SEED = 0
+
+def rank_error(k):
+    """k 對應的正規化排名誤差上限（約 99% 信賴度，取自 Apache DataSketches 對 KLL 的經驗公式）"""
+
+    return 2.296 / k ** 0.9723
+
+class KLLSketch:
+    """KLL 分位數摘要：以多層壓縮器保存加權樣本，可與其他摘要合併
+
+    第 h 層的每個樣本代表 2^h 筆原始資料。第 h 層超過容量時排序後隨機取奇數或偶數位置的
+    一半升到下一層，總權重維持為 n。查詢的分位數在排名上的誤差不超過 rank_error(k) × n，
+    尚未發生壓縮時結果是精確的。
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=SEED):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * CAPACITY_RATIO ** depth)), MIN_CAPACITY)
+
+    def size(self):
+        return sum(len(items) for items in self.levels)
+
+    def is_exact(self):
+        return len(self.levels) == 1
+
+    def update(self, values):
+        """加入一批數值，缺值會被忽略"""
+
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+        return self
+
+    def merge(self, other):
+        """併入另一個摘要；k 不同時以較小的 k 為準"""
+
+        self.k = min(self.k, other.k)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.compress()
+        return self
+
+    def compress(self):
+        """總樣本數超過各層容量的總和時，由最低的滿載層開始壓縮"""
+
+        while self.size() > sum(self.capacity(level) for level in range(len(self.levels))):
+            for level, items in enumerate(self.levels):
+                if len(items) < self.capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # 奇數個樣本時留下一個在原層，其餘兩兩取一升到下一層
+                odd = len(items) % 2
+                promoted = items[odd + int(self.rng.integers(2))::2]
+                self.levels[level] = items[:odd]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                break
+
+    def sorted_view(self):
+        """依數值排序的樣本與累計權重"""
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype=np.int64)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """累計權重首次達到 q × n 的樣本，等同 numpy 的 inverted_cdf；沒有資料時為 NaN"""
+
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if not self.n:
+            return np.full(len(qs), np.nan)
+        items, cumulative = self.sorted_view()
+        index = np.searchsorted(cumulative, np.maximum(qs * self.n, 1), side="left")
+        result = items[np.minimum(index, len(items) - 1)]
+        # 最小與最大值另外保存，兩端的分位數是精確的
+        result = np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, result))
+        return result
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def error(self):
+        """這個摘要的正規化排名誤差，精確時為 0"""
+
+        return 0.0 if self.is_exact() else rank_error(self.k)
+
+def sketch_frame(data, sketches, key_columns, k=DEFAULT_K):
+    """依 key_columns 分組，將價格加入對應的摘要"""
+
+    if data.empty:
+        return sketches
+    data = data.sort_values(key_columns, kind="stable")
+    keys = data[key_columns].to_numpy()
+    prices = data['price'].to_numpy(dtype=np.float64)
+    starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]).any(axis=1)])
+    for start, stop in zip(starts, np.r_[starts[1:], len(keys)]):
+        key = tuple(keys[start])
+        sketch = sketches.get(key)
+        if sketch is None:
+            sketch = sketches[key] = KLLSketch(k)
+        sketch.update(prices[start:stop])
+    return sketches
+
+def sketch_file(path, year, city, k=DEFAULT_K, residential_only=False, header_rows=1, chunksize=None):
+    """逐塊讀取單一實價登錄檔，回傳 {(縣市, 行政區, 年月): 摘要}；只計入該年份的交易"""
+
+    columns = [buildRollup.DISTRICT_KEY, buildRollup.PRICE_KEY, buildRollup.DATE_KEY]
+    sketches = {}
+    for chunk in ingestData.read_lvr_csv(path, header_rows=header_rows, columns=columns,
+                                         residential_only=residential_only,
+                                         chunksize=chunksize or ingestData.DEFAULT_CHUNKSIZE):
+        found = {ingestData.column_key(c): c for c in chunk.columns}
+        if len(found) < 3:
+            return sketches
+        date = chunk[found[buildRollup.DATE_KEY]]
+        data = pd.DataFrame({
+            'city': city,
+            'district': chunk[found[buildRollup.DISTRICT_KEY]].astype(str),
+            'date': (date.dt.year - 1911) * 100 + date.dt.month,
+            'price': chunk[found[buildRollup.PRICE_KEY]],
+        }).dropna()
+        data = data[data['date'] // 100 == int(year)]
+        data['date'] = data['date'].astype(int).map(lambda ym: f"{ym:05d}")
+        sketch_frame(data, sketches, ['city', 'district', 'date'], k)
+    return sketches
+
+def merge_sketches(target, sketches):
+    """將一組摘要併入 target，同一個鍵的摘要互相合併"""
+
+    for key, sketch in sketches.items():
+        if key in target:
+            target[key].merge(sketch)
+        else:
+            target[key] = sketch
+    return target
+
+def list_sources(root, source="merged"):
+    """要讀取的 (年份, 縣市, 路徑, 標題列數)；merged 讀合併後的年份資料夾，quarterly 直接讀各季度快照"""
+
+    root = Path(root)
+    sources = []
+    if source == "merged":
+        for year_dir in sorted(d for d in root.iterdir() if d.is_dir() and d.name.isdigit()):
+            cities = sorted({f.name.split('_', 1)[0] for f in year_dir.glob("*_lvr_land_*.csv")})
+            for city in cities:
+                sources.append((year_dir.name, city, buildRollup.select_price_file(year_dir, city), 1))
+    else:
+        for snapshot_dir in sorted(root.glob("[0-9]*_0[2-5]")):
+            cities = sorted({f.name.split('_', 1)[0] for f in snapshot_dir.glob("*_lvr_land_*.csv")})
+            for city in cities:
+                sources.append((snapshot_dir.name.split('_', 1)[0], city,
+                                buildRollup.select_price_file(snapshot_dir, city), 2))
+    return sources
+
+def _sketch_source(year, city, path, header_rows, k, residential_only, chunksize):
+    """子行程讀取單一檔案，錯誤訊息交回主行程"""
+
+    try:
+        return sketch_file(path, year, city, k, residential_only, header_rows, chunksize), None
+    except Exception as e:
+        return {}, f"  處理 {path} 時發生錯誤: {e}"
+
+def build_sketches(root=".", source="merged", k=DEFAULT_K, residential_only=False, workers=1, chunksize=None):
+    """一次讀過所有檔案，建立並合併每個 (縣市, 行政區, 年月) 的單價摘要"""
+
+    jobs = [(year, city, path, header_rows, k, residential_only, chunksize)
+            for year, city, path, header_rows in list_sources(root, source)]
+    sketches = {}
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_sketch_source, *zip(*jobs))
+            for partial, error in results:
+                if error:
+                    print(error)
+                merge_sketches(sketches, partial)
+    else:
+        for job in jobs:
+            partial, error = _sketch_source(*job)
+            if error:
+                print(error)
+            merge_sketches(sketches, partial)
+    return sketches
+
+def save_sketches(sketches, path):
+    """將所有摘要存成單一 .npz：鍵、(k, n, min, max)、各層樣本數與串接後的樣本"""
+
+    keys = sorted(sketches)
+    header = np.array([[s.k, s.n, s.min, s.max] for s in (sketches[key] for key in keys)],
+                      dtype=np.float64).reshape(-1, 4)
+    level_counts = np.array([len(sketches[key].levels) for key in keys], dtype=np.int64)
+    level_sizes = np.array([len(items) for key in keys for items in sketches[key].levels], dtype=np.int64)
+    items = [items for key in keys for items in sketches[key].levels]
+    np.savez_compressed(path, keys=np.array(keys, dtype=str).reshape(-1, 3), header=header,
+                        level_counts=level_counts, level_sizes=level_sizes,
+                        items=np.concatenate(items) if items else np.empty(0))
+
+def load_sketches(path):
+    """讀回 save_sketches 儲存的摘要，可再與新的摘要合併"""
+
+    with np.load(path) as data:
+        keys, header = data['keys'], data['header']
+        level_sizes = iter(data['level_sizes'])
+        items = data['items']
+        sketches = {}
+        offset = 0
+        for key, (k, n, low, high), count in zip(keys, header, data['level_counts']):
+            sketch = KLLSketch(int(k))
+            sketch.n, sketch.min, sketch.max = int(n), low, high
+            sketch.levels = []
+            for _ in range(count):
+                size = int(next(level_sizes))
+                sketch.levels.append(items[offset:offset + size].copy())
+                offset += size
+            sketches[tuple(str(part) for part in key)] = sketch
+    return sketches
+
+def summarize(sketches):
+    """每個摘要的筆數、p10/p25/中位數/p75/p90、四分位距與排名誤差"""
+
+    rows = []
+    for (city, district, date), sketch in sorted(sketches.items()):
+        p10, p25, median, p75, p90 = sketch.quantiles([0.1, 0.25, 0.5, 0.75, 0.9])
+        rows.append((city, district, date, sketch.n, p10, p25, median, p75, p90, p75 - p25, sketch.error()))
+    return pd.DataFrame(rows, columns=QUANTILE_COLUMNS)
+
+def build_quantiles(root=".", source="merged", k=DEFAULT_K, residential_only=False, workers=1, chunksize=None,
+                    output_file=QUANTILE_FILE, sketches_file=SKETCH_FILE):
+    """建立摘要並輸出各行政區每月的單價分位數表"""
+
+    root = Path(root)
+    sketches = build_sketches(root, source, k, residential_only, workers, chunksize)
+    save_sketches(sketches, root / sketches_file)
+
+    table = summarize(sketches)
+    output_path = root / output_file
+    table.to_csv(output_path, index=False, encoding='utf-8-sig')
+    size = sum(s.size() for s in sketches.values()) * 8
+    print(f"單價分位數表完成，共 {len(table)} 筆，摘要約 {size / max(len(sketches), 1) / 1024:.1f} KB/組，"
+          f"排名誤差 ≤ {rank_error(k):.2%}，儲存至 {output_path}")
+    return table
+
+def query(sketches, city, district=None, start=None, end=None):
+    """合併符合條件的摘要，回傳整段期間的分位數與誤差"""
+
+    merged = KLLSketch()
+    for (key_city, key_district, date), sketch in sketches.items():
+        if key_city != city or (district and key_district != district):
+            continue
+        if (start and int(date) // 100 < start) or (end and int(date) // 100 > end):
+            continue
+        merged.merge(sketch)
+    p10, p25, median, p75, p90 = merged.quantiles([0.1, 0.25, 0.5, 0.75, 0.9])
+    return {"count": merged.n, "p10": p10, "median": median, "p90": p90, "iqr": p75 - p25,
+            "rank_error": merged.error()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以可合併的 KLL 分位數摘要計算各行政區每月單價的中位數與分位數")
+    parser.add_argument("--root", default=".", help="合併資料（或各季度快照）所在的資料夾")
+    parser.add_argument("--source", choices=("merged", "quarterly"), default="merged",
+                        help="讀取合併後的年份資料夾，或直接讀取各季度快照")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="摘要大小，越大越精確")
+    parser.add_argument("--residential-only", action="store_true", help="只計入住宅類建物型態的交易")
+    parser.add_argument("--workers", type=int, default=1, help="平行讀取檔案的行程數")
+    parser.add_argument("--chunksize", type=int, help="每次讀取的筆數")
+    parser.add_argument("--query", nargs="+", metavar=("CITY", "DISTRICT"),
+                        help="只查詢既有摘要：縣市代碼與（可省略的）行政區")
+    parser.add_argument("--start-year", type=int, help="查詢的起始年份")
+    parser.add_argument("--end-year", type=int, help="查詢的結束年份")
+    args = parser.parse_args()
+
+    if args.query:
+        sketches = load_sketches(Path(args.root) / SKETCH_FILE)
+        result = query(sketches, args.query[0], args.query[1] if len(args.query) > 1 else None,
+                       args.start_year, args.end_year)
+        print(f"筆數 {result['count']}，中位數 {result['median']:.0f}，p10 {result['p10']:.0f}，"
+              f"p90 {result['p90']:.0f}，四分位距 {result['iqr']:.0f}，排名誤差 ≤ {result['rank_error']:.2%}")
+    else:
+        build_quantiles(args.root, args.source, args.k, args.residential_only, args.workers, args.chunksize)
@@ -0,0 +1,222 @@
+import os
+import json
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+ROLLUP_PATH = Path("Data") / "MergedHousePricingData" / "price_rollup.csv"
+PANEL_PATH = Path("Data") / "people_cleanedData" / "migration_panel.csv"
+
+ALL_DISTRICTS = "全部"
+DATASETS = {
+    "price": ["date", "district", "count", "mean", "min", "max"],
+    "population": ["date", "district", "net_migration", "population"],
+}
+
+class LRUCache:
+    """以回應內容的位元組數為上限的 LRU 快取"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+class DatasetStore:
+    """載入單價彙總表與遷徙人口長表，來源檔變動時重新載入並清除快取"""
+
+    def __init__(self, paths, cache):
+        self.paths = paths
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.signature = None
+        self.failed_signature = None
+        self.tables = {}
+
+    def file_signature(self):
+        signature = []
+        for name, path in sorted(self.paths.items()):
+            try:
+                stat = os.stat(path)
+                signature.append((name, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append((name, None, None))
+        return tuple(signature)
+
+    def load(self, path):
+        """讀入一個資料檔，依縣市分組以便查詢"""
+
+        if not os.path.exists(path):
+            return {}
+        df = pd.read_csv(path, encoding='utf-8-sig', dtype={'city': str, 'district': str, 'date': str})
+        df['year'] = df['date'].str[:3].astype(int)
+        return {city: group.sort_values(['date', 'district'], kind='stable')
+                for city, group in df.groupby('city', sort=False)}
+
+    def current(self):
+        """回傳目前的資料與版本；來源檔的大小或修改時間改變時重新載入
+
+        載入失敗（例如檔案寫到一半）時繼續提供先前的資料，直到來源檔再次變動才重試。
+        """
+
+        signature = self.file_signature()
+        if signature != self.signature and signature != self.failed_signature:
+            with self.lock:
+                if signature != self.signature and signature != self.failed_signature:
+                    try:
+                        tables = {name: self.load(path) for name, path in self.paths.items()}
+                    except Exception as e:
+                        self.failed_signature = signature
+                        print(f"載入資料失敗，繼續使用先前的資料: {type(e).__name__}: {e}")
+                    else:
+                        self.tables = tables
+                        self.cache.clear()
+                        self.signature = signature
+                        print(f"已載入資料: {', '.join(str(p) for p in self.paths.values())}")
+        return self.tables, self.signature
+
+    def query(self, dataset, city, district=ALL_DISTRICTS, start_year=None, end_year=None):
+        """查詢單一縣市（與行政區）在年份範圍內的每月序列"""
+
+        tables, _ = self.current()
+        rows = tables[dataset].get(city)
+        if rows is None:
+            return []
+        mask = pd.Series(True, index=rows.index)
+        if district and district != ALL_DISTRICTS:
+            mask &= rows['district'] == district
+        if start_year is not None:
+            mask &= rows['year'] >= start_year
+        if end_year is not None:
+            mask &= rows['year'] <= end_year
+        columns = [c for c in DATASETS[dataset] if c in rows.columns]
+        return rows.loc[mask, columns].to_dict(orient='records')
+
+def encode(records, output_format):
+    """將查詢結果轉為 JSON 或 CSV 位元組"""
+
+    if output_format == "csv":
+        return pd.DataFrame.from_records(records).to_csv(index=False).encode('utf-8')
+    return json.dumps(records, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def make_handler(store, cache):
+    class QueryHandler(BaseHTTPRequestHandler):
+        """GET /price 或 /population?city=A&district=中山區&start=104&end=113[&format=csv]"""
+
+        def do_GET(self):
+            try:
+                self.handle_get()
+            except Exception as e:
+                self.log_error("查詢 %s 時發生錯誤: %s", self.path, e)
+                self.send_json_error(500, "伺服器無法處理此查詢")
+
+        def handle_get(self):
+            url = urlparse(self.path)
+            dataset = url.path.strip('/')
+            if dataset == "health":
+                return self.send_body(200, json.dumps({
+                    "entries": len(cache.entries), "bytes": cache.size,
+                    "hits": cache.hits, "misses": cache.misses,
+                }).encode('utf-8'), "application/json")
+            if dataset not in DATASETS:
+                return self.send_json_error(404, "可查詢 /price 或 /population")
+
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            city = params.get("city")
+            if not city:
+                return self.send_json_error(400, "缺少 city 參數")
+            try:
+                start_year = int(params["start"]) if "start" in params else None
+                end_year = int(params["end"]) if "end" in params else None
+            except ValueError:
+                return self.send_json_error(400, "start 與 end 必須是民國年")
+            district = params.get("district", ALL_DISTRICTS)
+            output_format = "csv" if params.get("format") == "csv" else "json"
+
+            _, version = store.current()
+            key = (version, dataset, city, district, start_year, end_year, output_format)
+            body = cache.get(key)
+            status = "hit"
+            if body is None:
+                status = "miss"
+                body = encode(store.query(dataset, city, district, start_year, end_year), output_format)
+                cache.put(key, body)
+
+            content_type = "text/csv" if output_format == "csv" else "application/json"
+            self.send_body(200, body, content_type, {"X-Cache": status})
+
+        def send_body(self, code, body, content_type, headers=None):
+            self.send_response(code)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json_error(self, code, message):
+            """錯誤訊息放在 JSON 內容中；狀態列只能使用 latin-1，不能放中文"""
+            body = json.dumps({"error": message}, ensure_ascii=False).encode('utf-8')
+            self.send_body(code, body, "application/json")
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryHandler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在本機以 HTTP 提供各行政區房價與人口序列的查詢")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--rollup", default=str(ROLLUP_PATH), help="buildRollup.py 產生的單價彙總表")
+    parser.add_argument("--panel", default=str(PANEL_PATH), help="buildPanel.py 產生的遷徙人口長表")
+    parser.add_argument("--cache-mb", type=float, default=64, help="查詢結果快取的記憶體上限 (MB)")
+    args = parser.parse_args()
+
+    cache = LRUCache(int(args.cache_mb * 1024 * 1024))
+    store = DatasetStore({"price": args.rollup, "population": args.panel}, cache)
+    store.current()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store, cache))
+    print(f"查詢服務啟動於 http://{args.host}:{args.port}/ ，按 Ctrl+C 結束")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
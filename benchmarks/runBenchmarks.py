@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCHMARK_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "Scripts"))
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+import synthData
+from pipelineMetrics import peak_child_rss_mb, peak_rss_mb
+
+RESULTS_FILE = BENCHMARK_DIR / "results.jsonl"
+DEFAULT_SCALES = (1, 5, 20)
+
+def merge_year_step(root, options):
+    import mergeData
+
+    year = options["years"][0]
+    output_dir, existing_dirs = mergeData.prepare_year(year)
+    mergeData.merge_year_data(existing_dirs, output_dir, year, chunksize=options.get("chunksize"))
+
+def merge_all_step(root, options):
+    import mergeData
+
+    mergeData.merge_all_years(options["years"][0], options["years"][-1], workers=options.get("workers", 1),
+                              rollup=False, force=True, chunksize=options.get("chunksize"), binary_cache=False)
+
+def rollup_step(root, options):
+    import buildRollup
+
+    buildRollup.build_rollup(".")
+
+def panel_step(root, options):
+    import buildPanel
+
+    buildPanel.build_panel(Path(root) / synthData.PEOPLE_DIR)
+
+def lag_step(root, options):
+    import buildRollup
+    import lagAnalysis
+
+    lags = list(range(-12, 13))
+    keys, months, x, y = lagAnalysis.load_matrices(buildRollup.ROLLUP_FILE,
+                                                   Path(root) / synthData.PEOPLE_DIR / "migration_panel.csv")
+    lagAnalysis.analyze(x, y, lags, 3)
+
+# 依序執行，後面的步驟使用前面步驟的輸出
+STEPS = {
+    "merge_year_data": merge_year_step,
+    "merge_all_years": merge_all_step,
+    "build_rollup": rollup_step,
+    "build_panel": panel_step,
+    "lag_analysis": lag_step,
+}
+
+def run_step(name, root, options, results):
+    """在全新的子程序中執行單一步驟，量測耗時與最高記憶體
+
+    workers > 1 時合併在行程池的工作程序中進行，另外記錄其中最大的工作程序的最高記憶體。
+    """
+
+    os.chdir(Path(root) / synthData.HOUSE_DIR)
+    baseline = peak_rss_mb()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        STEPS[name](root, options)
+        seconds = time.perf_counter() - start
+    results.put({"seconds": seconds, "peak_rss_mb": peak_rss_mb(), "peak_child_rss_mb": peak_child_rss_mb(),
+                 "baseline_rss_mb": baseline})
+
+def measure(name, root, options):
+    """以 spawn 啟動子程序，避免繼承前一個步驟的記憶體"""
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run_step, args=(name, str(root), options, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"{name} 執行失敗 (exit code {process.exitcode})")
+    return results.get()
+
+def git_commit():
+    """目前的 commit 與工作目錄是否有未提交的變更"""
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+def run_benchmarks(scales, steps, seed=0, cities="AGQST", years=(112, 113), repeat=1, workdir=None,
+                   options=None, output=RESULTS_FILE, keep=False):
+    """對每個倍率產生資料並執行各步驟，結果逐筆附加到 JSONL 檔"""
+
+    import numpy as np
+    import pandas as pd
+
+    commit, dirty = git_commit()
+    options = dict(options or {}, years=list(years))
+    environment = {
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+    base = Path(workdir or tempfile.mkdtemp(prefix="lvr_bench_")).resolve()
+    records = []
+    try:
+        for scale in scales:
+            root = base / f"scale_{scale}"
+            shutil.rmtree(root, ignore_errors=True)
+            data = synthData.generate(root, scale, seed, cities, years)
+            print(f"倍率 {scale}x：{data['files']} 個檔案，{data['rows']} 筆，{data['bytes'] / 1e6:.1f} MB")
+
+            for name in steps:
+                for run in range(repeat):
+                    result = measure(name, root, options)
+                    record = dict(environment, timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"), step=name,
+                                  scale=scale, seed=seed, run=run, options=options, input_rows=data["rows"],
+                                  input_bytes=data["bytes"], **result)
+                    records.append(record)
+                    with open(output, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+                    rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] is not None else "-"
+                    if result["peak_child_rss_mb"] is not None:
+                        rss += f"（工作程序 {result['peak_child_rss_mb']:.0f} MB）"
+                    print(f"  {name:<16} {result['seconds']:8.2f} 秒  最高記憶體 {rss}")
+            if not keep:
+                shutil.rmtree(root, ignore_errors=True)
+    finally:
+        if not keep and workdir is None:
+            shutil.rmtree(base, ignore_errors=True)
+    return records
+
+def compare(output=RESULTS_FILE):
+    """列出各 commit 每個步驟與倍率的最短耗時與最高記憶體"""
+
+    import pandas as pd
+
+    df = pd.read_json(output, lines=True)
+    df["commit"] = df["commit"].str[:8] + df["dirty"].map({True: "+", False: ""}).fillna("")
+    df["options"] = df["options"].map(
+        lambda options: ",".join(f"{k}={v}" for k, v in sorted(options.items()) if k != "years" and v is not None))
+    if "peak_child_rss_mb" not in df:
+        df["peak_child_rss_mb"] = None
+    order = df.drop_duplicates("commit")["commit"].tolist()
+    summary = df.groupby(["step", "options", "scale", "commit"], sort=False).agg(
+        seconds=("seconds", "min"), peak_rss_mb=("peak_rss_mb", "max"),
+        peak_child_rss_mb=("peak_child_rss_mb", "max"))
+    for column, title in (("seconds", "耗時（秒）"), ("peak_rss_mb", "最高記憶體 (MB)"),
+                          ("peak_child_rss_mb", "工作程序最高記憶體 (MB)")):
+        print(f"\n{title}")
+        print(summary[column].unstack("commit")[order].round(3).to_string())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="以合成資料量測合併與彙總步驟的耗時與記憶體")
+    parser.add_argument("--scales", type=float, nargs="+", default=list(DEFAULT_SCALES))
+    parser.add_argument("--steps", nargs="+", choices=list(STEPS), default=list(STEPS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cities", default="AGQST")
+    parser.add_argument("--start-year", type=int, default=112)
+    parser.add_argument("--end-year", type=int, default=113)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="傳給 merge_all_years 的行程數")
+    parser.add_argument("--chunksize", type=int, help="以串流合併並指定每塊筆數")
+    parser.add_argument("--workdir", help="合成資料的存放位置，預設為暫存資料夾")
+    parser.add_argument("--keep", action="store_true", help="保留產生的合成資料")
+    parser.add_argument("--output", default=str(RESULTS_FILE))
+    parser.add_argument("--compare", action="store_true", help="只比較既有的量測結果")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.output)
+    else:
+        scales = [int(s) if float(s).is_integer() else s for s in args.scales]
+        options = {"workers": args.workers, "chunksize": args.chunksize}
+        run_benchmarks(scales, args.steps, args.seed, args.cities, range(args.start_year, args.end_year + 1),
+                       args.repeat, args.workdir, options, args.output, args.keep)
@@ -0,0 +1,207 @@
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Scripts"))
+
+from cityCodes import city_code
+
+HOUSE_DIR = "house"
+PEOPLE_DIR = "people"
+BASE_ROWS = 500
+MALFORMED_RATE = 0.002
+BIG5_RATE = 0.3
+
+COMMON_COLUMNS = [
+    ("鄉鎮市區", "The villages and towns urban district"),
+    ("交易標的", "transaction sign"),
+    ("土地位置建物門牌", "land sector position building sector house number plate"),
+    ("土地移轉總面積平方公尺", "land shifting total area square meter"),
+    ("都市土地使用分區", "the use zoning or compiles and checks"),
+    ("非都市土地使用分區", "the non-metropolis land use district"),
+    ("非都市土地使用編定", "non-metropolis land use"),
+    ("交易年月日", "transaction year month and day"),
+    ("交易筆棟數", "transaction pen number"),
+    ("移轉層次", "shifting level"),
+    ("總樓層數", "total floor number"),
+    ("建物型態", "building state"),
+    ("主要用途", "main use"),
+    ("主要建材", "main building materials"),
+    ("建築完成年月", "construction to complete the years"),
+    ("建物移轉總面積平方公尺", "building shifting total area"),
+    ("建物現況格局-房", "Building present situation pattern - room"),
+    ("建物現況格局-廳", "building present situation pattern - hall"),
+    ("建物現況格局-衛", "building present situation pattern - health"),
+    ("建物現況格局-隔間", "building present situation pattern - compartmented"),
+    ("有無管理組織", "Whether there is manages the organization"),
+    ("總價元", "total price NTD"),
+    ("單價元平方公尺", "the unit price (NTD / square meter)"),
+    ("車位類別", "the berth category"),
+    ("車位移轉總面積平方公尺", "berth shifting total area square meter"),
+    ("車位總價元", "the berth total price NTD"),
+    ("備註", "the note"),
+    ("編號", "serial number"),
+]
+EXTRA_COLUMNS = {
+    "a": [("主建物面積", "main building area"), ("附屬建物面積", "auxiliary building area"),
+          ("陽台面積", "balcony area"), ("電梯", "elevator"), ("移轉編號", "transaction number")],
+    "b": [("建案名稱", "build case"), ("棟及號", "buildings"), ("解約情形", "termination type")],
+}
+
+DISTRICT_NAMES = ["中正區", "大同區", "中山區", "松山區", "大安區", "萬華區",
+                  "信義區", "士林區", "北投區", "內湖區", "南港區", "文山區"]
+TARGETS = ["房地(土地+建物)", "房地(土地+建物)+車位", "建物", "土地", "車位"]
+BUILDING_TYPES = ["住宅大樓(11層含以上有電梯)", "華廈(10層含以下有電梯)", "公寓(5樓含以下無電梯)",
+                  "透天厝", "套房(1房1廳1衛)", "店面(店鋪)", "辦公商業大樓", "其他"]
+USES = ["住家用", "商業用", "住商用", "其他"]
+MATERIALS = ["鋼筋混凝土造", "加強磚造", "鋼骨造", "磚造"]
+FLOORS = ["一層", "二層", "三層", "四層", "五層", "七層", "十二層", "全"]
+
+def city_districts(code, rng):
+    """每個縣市固定一組行政區名稱"""
+
+    count = int(rng.integers(6, len(DISTRICT_NAMES) + 1))
+    return DISTRICT_NAMES[:count]
+
+def quarter_months(quarter):
+    """季度資料夾 {年}_0N 收錄的交易月份"""
+
+    first = (quarter - 2) * 3 + 1
+    return np.arange(first, first + 3)
+
+def completion_dates(rng, year, rows):
+    """建築完成年月：民國百年以前補零為七碼（0821027），少數為文字，與實際下載的檔案相同"""
+
+    dates = (year - rng.integers(0, 40, rows)) * 10000 + rng.integers(1, 13, rows) * 100 + rng.integers(1, 29, rows)
+    return np.where(rng.random(rows) < 0.01, "未登記", [f"{date:07d}" for date in dates])
+
+def make_rows(rng, code, kind, districts, year, quarter, rows):
+    """產生單一季度單一檔案的實價登錄資料"""
+
+    month = rng.choice(quarter_months(quarter), rows)
+    day = rng.integers(1, 29, rows)
+    area = rng.gamma(4.0, 25.0, rows).round(2)
+    unit_price = rng.lognormal(11.5, 0.45, rows).round()
+    parking = rng.random(rows) < 0.3
+    parking_price = np.where(parking, rng.integers(50, 300, rows) * 10000, 0)
+    serial = [f"RP{code}{kind.upper()}{year}{quarter}{i:09d}" for i in rng.integers(0, 10 ** 9, rows)]
+
+    data = {
+        "鄉鎮市區": rng.choice(districts, rows),
+        "交易標的": rng.choice(TARGETS, rows),
+        "土地位置建物門牌": [f"{city_code[code]}某路{n}號" for n in rng.integers(1, 999, rows)],
+        "土地移轉總面積平方公尺": rng.gamma(2.0, 15.0, rows).round(2),
+        "都市土地使用分區": rng.choice(["住", "商", "工", ""], rows),
+        "非都市土地使用分區": "",
+        "非都市土地使用編定": "",
+        "交易年月日": year * 10000 + month * 100 + day,
+        "交易筆棟數": [f"土地{a}建物{b}車位{c}" for a, b, c in rng.integers(0, 3, (rows, 3))],
+        "移轉層次": rng.choice(FLOORS, rows),
+        "總樓層數": rng.integers(1, 30, rows),
+        "建物型態": rng.choice(BUILDING_TYPES, rows),
+        "主要用途": rng.choice(USES, rows),
+        "主要建材": rng.choice(MATERIALS, rows),
+        "建築完成年月": completion_dates(rng, year, rows),
+        "建物移轉總面積平方公尺": area,
+        "建物現況格局-房": rng.integers(0, 5, rows),
+        "建物現況格局-廳": rng.integers(0, 3, rows),
+        "建物現況格局-衛": rng.integers(0, 4, rows),
+        "建物現況格局-隔間": rng.choice(["有", "無"], rows),
+        "有無管理組織": rng.choice(["有", "無"], rows),
+        "總價元": (area * unit_price + parking_price).round().astype(np.int64),
+        "單價元平方公尺": unit_price.astype(np.int64),
+        "車位類別": np.where(parking, rng.choice(["坡道平面", "坡道機械", "升降平面"], rows), ""),
+        "車位移轉總面積平方公尺": np.where(parking, rng.gamma(3.0, 10.0, rows).round(2), 0.0),
+        "車位總價元": parking_price,
+        "備註": rng.choice(["", "親友、員工、共有人或其他特殊關係間之交易；", "含增建或未登記建物；"], rows),
+        "編號": serial,
+    }
+    if kind == "a":
+        data.update({
+            "主建物面積": (area * 0.7).round(2),
+            "附屬建物面積": (area * 0.05).round(2),
+            "陽台面積": (area * 0.08).round(2),
+            "電梯": rng.choice(["有", "無", ""], rows),
+            "移轉編號": "",
+        })
+    else:
+        data.update({
+            "建案名稱": [f"建案{n}" for n in rng.integers(1, 200, rows)],
+            "棟及號": [f"A{n}棟" for n in rng.integers(1, 20, rows)],
+            "解約情形": rng.choice(["", "", "", "全部解約"], rows),
+        })
+    return pd.DataFrame(data)
+
+def write_lvr_file(path, df, kind, encoding, rng):
+    """寫入中英兩列標題的原始下載格式，並夾雜欄位數錯誤的資料列"""
+
+    columns = COMMON_COLUMNS + EXTRA_COLUMNS[kind]
+    lines = df.to_csv(header=False, index=False, lineterminator="\n").splitlines()
+    # 第一筆資料不可為壞資料：pandas 會依第一列的欄位數推斷索引，整份檔案的欄位都會錯位
+    for position in sorted(rng.integers(1, len(lines) + 1, int(len(lines) * MALFORMED_RATE)), reverse=True):
+        lines.insert(position, ",".join(["壞資料"] * (len(columns) + 3)))
+
+    with open(path, "w", encoding=encoding, errors="replace", newline="") as f:
+        f.write(",".join(zh for zh, _ in columns) + "\n")
+        f.write(",".join(en for _, en in columns) + "\n")
+        f.write("\n".join(lines) + "\n")
+
+def write_migration(root, code, districts, rng, years):
+    """產生與儀表板下載後清理過的格式相同的淨遷徙與起始人口檔"""
+
+    folder = Path(root) / f"{code}_{city_code[code].replace('臺', '台')}"
+    folder.mkdir(parents=True, exist_ok=True)
+
+    base = rng.integers(20_000, 300_000, len(districts))
+    init = pd.DataFrame({"區域別": ["總計"] + districts,
+                         "總計": [f"{v:,}" for v in [base.sum()] + base.tolist()]})
+    init.to_csv(folder / f"{code}_init.csv", index=False, encoding="utf-8-sig", quoting=1)
+
+    for year in years:
+        values = rng.normal(0, 150, (len(districts), 12)).round().astype(int)
+        table = pd.DataFrame(values, columns=[f"{m}月" for m in range(1, 13)])
+        table.insert(0, "區域別", districts)
+        total = pd.DataFrame([["總計"] + values.sum(axis=0).tolist()], columns=table.columns)
+        pd.concat([total, table]).to_csv(folder / f"{code}_{year}.csv", index=False, encoding="utf-8-sig")
+
+def generate(root, scale=1, seed=0, cities="AGQST", years=(112, 113), base_rows=BASE_ROWS,
+             migration_years=range(104, 114)):
+    """依種子與倍率產生完整的合成資料集，回傳 {"files", "rows", "bytes"}"""
+
+    root = Path(root)
+    rng = np.random.default_rng(seed)
+    stats = {"files": 0, "rows": 0, "bytes": 0}
+
+    for code in cities:
+        districts = city_districts(code, rng)
+        write_migration(root / PEOPLE_DIR, code, districts, rng, migration_years)
+
+        for year in years:
+            for quarter in range(2, 6):
+                folder = root / HOUSE_DIR / f"{year}_0{quarter}"
+                folder.mkdir(parents=True, exist_ok=True)
+                for kind in ("a", "b"):
+                    rows = int(base_rows * scale * rng.uniform(0.5, 1.5))
+                    df = make_rows(rng, code, kind, districts, year, quarter, rows)
+                    encoding = "big5" if rng.random() < BIG5_RATE else "utf-8"
+                    path = folder / f"{code}_lvr_land_{kind}.csv"
+                    write_lvr_file(path, df, kind, encoding, rng)
+                    stats["files"] += 1
+                    stats["rows"] += rows
+                    stats["bytes"] += path.stat().st_size
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="產生供效能測試使用的合成實價登錄與遷徙資料")
+    parser.add_argument("root", help="輸出資料夾")
+    parser.add_argument("--scale", type=float, default=1, help="資料量倍率，1 約為每檔 500 筆")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cities", default="AGQST")
+    parser.add_argument("--start-year", type=int, default=112)
+    parser.add_argument("--end-year", type=int, default=113)
+    args = parser.parse_args()
+
+    stats = generate(args.root, args.scale, args.seed, args.cities, range(args.start_year, args.end_year + 1))
+    print(f"產生 {stats['files']} 個檔案，共 {stats['rows']} 筆，{stats['bytes'] / 1e6:.1f} MB")
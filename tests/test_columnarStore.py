@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+
+import columnarStore
+
+def frame(districts, dates, counts, **extra):
+    return pd.DataFrame({"鄉鎮市區": districts, "交易年月日": dates, "交易筆棟數": counts, **extra})
+
+def test_partitions_share_one_schema(tmp_path):
+    # 行政區數量不同、未宣告欄位推斷出的型別也不同的兩個分區
+    small = frame(["中山區", "大安區"], ["1130102", "1130101"], [1, 2])
+    large = frame([f"區{i}" for i in range(500)], ["1130105"] * 500, ["土地1建物0車位1"] * 500, 建案名稱="某建案")
+    columnarStore.write_partition(small, tmp_path, 113, "A_lvr_land_a.csv")
+    columnarStore.write_partition(large, tmp_path, 113, "B_lvr_land_b.csv")
+
+    assert len(columnarStore.read_dataset(tmp_path, years=[113], cities=["A"])) == 2
+    df = columnarStore.read_dataset(tmp_path)
+    assert len(df) == 502
+    assert df["建案名稱"].notna().sum() == 500
+    assert len(columnarStore.read_dataset(tmp_path, date_range=(1130101, 1130101))) == 1
+
+def test_partition_writer_sorts_each_chunk(tmp_path):
+    writer = columnarStore.PartitionWriter(tmp_path, 113, "A_lvr_land_a.csv")
+    writer.write(frame(["中山區"] * 3, ["1130301", "1130101", "1130201"], [1, 2, 3]))
+    writer.write(frame(["大安區"] * 2, ["1130601", "1130401"], ["土地1", "土地2"]))
+    path = writer.close()
+
+    dates = pq.read_table(path).column("交易年月日").to_pylist()
+    assert dates == [1130101, 1130201, 1130301, 1130401, 1130601]
@@ -0,0 +1,54 @@
+import json
+
+import pandas as pd
+
+import mergeData
+import mergeManifest
+
+HEADER = "鄉鎮市區,總價元,編號\nThe villages and towns urban district,total price NTD,serial number\n"
+QUARTERS = {
+    "113_02": "中山區,100,RP1\n大安區,300,RP2\n信義區,500,\n",
+    # RP1 於下一季更正價格；沒有編號的信義區交易原樣重複出現
+    "113_03": "中山區,200,RP1\n信義區,500,\n",
+}
+
+def write_quarters(root):
+    for quarter, rows in QUARTERS.items():
+        (root / quarter).mkdir(parents=True)
+        (root / quarter / "A_lvr_land_a.csv").write_text(HEADER + rows, encoding="utf-8-sig")
+    return [str(root / quarter) for quarter in QUARTERS]
+
+def test_dedup_keeps_latest_quarter(tmp_path):
+    source_dirs = write_quarters(tmp_path)
+    output_dir = tmp_path / "113"
+    output_dir.mkdir()
+
+    mergeData.merge_file(source_dirs, output_dir, "A_lvr_land_a.csv", log=lambda message: None, dedup=True)
+    df = pd.read_csv(output_dir / "A_lvr_land_a.csv", encoding="utf-8-sig")
+    rows = {(row[0], row[1], row[-1]) for row in df.itertuples(index=False)}
+    assert len(df) == 3
+    # 依編號保留較新的季度，沒有編號的重複列依整列內容移除
+    assert rows == {("中山區", 200, "113_03"), ("大安區", 300, "113_02"), ("信義區", 500, "113_03")}
+
+def test_row_keys_use_serial_then_row_content():
+    chunk = pd.DataFrame({"編號": ["RP1", "RP1", None, None], "總價元": [100, 200, 500, 500]})
+    keys, has_serial = mergeData.row_keys(chunk)
+    assert has_serial.tolist() == [True, True, False, False]
+    assert keys[0] == keys[1] and keys[2] == keys[3] and keys[0] != keys[2]
+    assert mergeData.latest_rows(keys).tolist() == [False, True, False, True]
+
+def test_changing_dedup_forces_rebuild(tmp_path):
+    source_dirs = write_quarters(tmp_path)
+    mergeData.merge_all_years(113, 113, rollup=False, binary_cache=False, root=tmp_path)
+    manifest = json.loads((tmp_path / mergeManifest.MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert manifest["outputs"]["113/A_lvr_land_a.csv"]["dedup"] is False
+    assert len(pd.read_csv(tmp_path / "113" / "A_lvr_land_a.csv", encoding="utf-8-sig")) == 5
+
+    assert mergeData.plan_year(manifest, 113, source_dirs, "csv", root=tmp_path) == {}
+    assert list(mergeData.plan_year(manifest, 113, source_dirs, "csv", dedup=True, root=tmp_path)) == [
+        "A_lvr_land_a.csv"]
+
+    mergeData.merge_all_years(113, 113, rollup=False, binary_cache=False, dedup=True, root=tmp_path)
+    manifest = json.loads((tmp_path / mergeManifest.MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert manifest["outputs"]["113/A_lvr_land_a.csv"]["dedup"] is True
+    assert len(pd.read_csv(tmp_path / "113" / "A_lvr_land_a.csv", encoding="utf-8-sig")) == 3
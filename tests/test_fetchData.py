@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+import fetchData
+
+CSV = "區域別,淨遷徙人數\n中山區,12\n".encode("utf-8")
+
+class StandIn(BaseHTTPRequestHandler):
+    """依月份模擬儀表板：1 月正常、2 月先 503 再成功、3 月 404、4 月以 200 回傳登入頁"""
+
+    hits = Counter()
+
+    def do_GET(self):
+        month = int(parse_qs(urlparse(self.path).query)["month"][0])
+        StandIn.hits[month] += 1
+        if month == 2 and StandIn.hits[month] == 1:
+            self.reply(503, b"busy", "text/plain")
+        elif month == 3:
+            self.reply(404, b"not found", "text/plain")
+        elif month == 4:
+            self.reply(200, b"<html><body>login</body></html>", "text/html; charset=utf-8")
+        else:
+            self.reply(200, CSV, "text/csv")
+
+    def reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def endpoint():
+    StandIn.hits.clear()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/query"
+    httpd.shutdown()
+    httpd.server_close()
+
+def fetch(endpoint, tasks):
+    return asyncio.run(fetchData.fetch_all(endpoint, tasks, concurrency=4, rate=0, retries=2, backoff=0.01, timeout=5))
+
+def test_fetch_all_retries_and_skips_existing(tmp_path, endpoint):
+    tasks = [task for task in fetchData.build_tasks(tmp_path, "A", 113, 113) if task[3] <= 4]
+    successful, failures = fetch(endpoint, tasks)
+
+    assert successful == 2
+    assert sorted(month for _, _, month, _ in failures) == [3, 4]
+    assert (tmp_path / "A_11301.csv").read_bytes() == CSV
+    assert (tmp_path / "A_11302.csv").read_bytes() == CSV
+    assert not (tmp_path / "A_11303.csv").exists()
+    assert not (tmp_path / "A_11304.csv").exists()
+    assert not list(tmp_path.glob("*.part"))
+    # 503 重試一次後成功；404 為永久錯誤不重試；HTML 頁面重試到次數用完
+    assert StandIn.hits == {1: 1, 2: 2, 3: 1, 4: 3}
+
+    # 重跑時只剩未成功的月份
+    remaining = [task for task in fetchData.build_tasks(tmp_path, "A", 113, 113) if task[3] <= 4]
+    assert [task[3] for task in remaining] == [3, 4]
+
+def test_check_body_rejects_html():
+    assert fetchData.check_body(CSV, "text/csv") is None
+    assert fetchData.check_body(b"", "text/csv") is not None
+    assert fetchData.check_body(b"\xef\xbb\xbf<!DOCTYPE html>", "application/octet-stream") is not None
+    assert fetchData.check_body(CSV, "text/html") is not None
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import mergeData
+import mergeManifest
+import synthData
+
+def merged_files(root):
+    return sorted(p.name for p in (root / "113").glob("*.csv"))
+
+def test_manifest_paths_do_not_depend_on_cwd(tmp_path, monkeypatch):
+    synthData.generate(tmp_path, scale=1, cities="AG", years=(113,), base_rows=20)
+    root = tmp_path / synthData.HOUSE_DIR
+
+    mergeData.merge_all_years(113, 113, rollup=False, binary_cache=False, root=root)
+    manifest = json.loads((root / mergeManifest.MANIFEST_FILE).read_text(encoding="utf-8"))
+    entry = manifest["outputs"]["113/A_lvr_land_a.csv"]
+    assert entry["source_dirs"] == ["113_02", "113_03", "113_04", "113_05"]
+    assert entry["outputs"] == ["113/A_lvr_land_a.csv"]
+
+    # 在資料夾內以預設的 root 執行，所有檔案都應視為最新
+    monkeypatch.chdir(root)
+    existing_dirs = mergeData.prepare_year(113)[1]
+    assert mergeData.plan_year(manifest, 113, existing_dirs, "csv") == {}
+
+    # 換個工作目錄刪除來源，對應的輸出檔也要被移除
+    monkeypatch.chdir(tmp_path)
+    for path in root.glob("113_0*/G_lvr_land_b.csv"):
+        path.unlink()
+    mergeData.merge_all_years(113, 113, rollup=False, binary_cache=False, root=synthData.HOUSE_DIR)
+    assert "G_lvr_land_b.csv" not in merged_files(root)
+    manifest = json.loads((root / mergeManifest.MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert "113/G_lvr_land_b.csv" not in manifest["outputs"]
+
+def test_parquet_merge_keeps_csv_outputs(tmp_path):
+    pytest.importorskip("pyarrow")
+    synthData.generate(tmp_path, scale=1, cities="A", years=(113,), base_rows=20)
+    root = tmp_path / synthData.HOUSE_DIR
+
+    mergeData.merge_all_years(113, 113, rollup=False, binary_cache=False, root=root)
+    csv_files = merged_files(root)
+    mergeData.merge_all_years(113, 113, output_format="parquet", rollup=False, binary_cache=False, root=root)
+
+    # 改以 Parquet 合併不可刪除 RAPP 讀取的 CSV
+    assert merged_files(root) == csv_files
+    manifest = json.loads((root / mergeManifest.MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert manifest["outputs"]["113/A_lvr_land_a.csv"]["outputs"] == [
+        "parquet/year=113/city=A/lvr_land_a.parquet", "113/A_lvr_land_a.csv"]
+
+    # 來源刪除時兩種格式的輸出都要移除
+    for path in root.glob("113_0*/A_lvr_land_a.csv"):
+        path.unlink()
+    mergeData.merge_all_years(113, 113, output_format="parquet", rollup=False, binary_cache=False, root=root)
+    assert "A_lvr_land_a.csv" not in merged_files(root)
+    assert not (root / "parquet/year=113/city=A/lvr_land_a.parquet").exists()
@@ -0,0 +1,55 @@
+import re
+import shutil
+
+import pytest
+
+import baselineMerge
+import mergeData
+import synthData
+
+YEARS = (112, 113)
+MODES = {
+    "workers": dict(workers=4),
+    "chunksize": dict(chunksize=300),
+    "chunksize_workers": dict(chunksize=300, workers=4),
+}
+
+def merged_outputs(root):
+    """各年份合併檔的相對路徑與內容"""
+
+    return {p.relative_to(root).as_posix(): p.read_bytes()
+            for year in YEARS for p in sorted((root / str(year)).glob("*.csv"))}
+
+def merge_copy(source, target, **options):
+    shutil.copytree(source, target)
+    mergeData.merge_all_years(YEARS[0], YEARS[-1], rollup=False, force=True, binary_cache=False,
+                              root=target, **options)
+    return merged_outputs(target)
+
+@pytest.fixture(scope="module")
+def house(tmp_path_factory):
+    root = tmp_path_factory.mktemp("synth")
+    synthData.generate(root, scale=1, cities="AG", years=YEARS)
+    return root / synthData.HOUSE_DIR
+
+@pytest.fixture(scope="module")
+def reference(house, tmp_path_factory):
+    return merge_copy(house, tmp_path_factory.mktemp("serial") / "house")
+
+def test_reference_is_not_empty(reference):
+    assert len(reference) == 8
+    assert all(reference.values())
+    # 建築完成年月混有文字與數字，逐塊讀取時最容易失去前導零
+    assert all(re.search(rb",0\d{6},", content) and "未登記".encode() in content for content in reference.values())
+
+@pytest.mark.parametrize("mode", MODES)
+def test_merge_modes_match_serial(house, reference, tmp_path, mode):
+    assert merge_copy(house, tmp_path / "house", **MODES[mode]) == reference
+
+def test_serial_matches_baseline_script(house, reference, tmp_path, monkeypatch):
+    target = tmp_path / "house"
+    shutil.copytree(house, target)
+    # 原本的程式以工作目錄為資料夾
+    monkeypatch.chdir(target)
+    baselineMerge.merge_all_years(YEARS[0], YEARS[-1])
+    assert merged_outputs(target) == reference
@@ -0,0 +1,31 @@
+import mergeData
+import pipeline
+import synthData
+
+def test_pipeline_reuses_merges_from_mergeData(tmp_path, monkeypatch):
+    synthData.generate(tmp_path / "Data", scale=1, cities="AG", years=(113,), base_rows=20)
+    data_dir = tmp_path / "Data"
+    house_dir = data_dir / synthData.HOUSE_DIR
+
+    # mergeData.py 在資料夾內執行，pipeline.py 在上層執行，兩者共用同一份合併紀錄
+    monkeypatch.chdir(house_dir)
+    mergeData.merge_all_years(113, 113, rollup=False, binary_cache=False)
+    monkeypatch.chdir(tmp_path)
+    tasks = pipeline.build_graph("Data", "AG", 113, 113, stages=("merge",), house_dir=house_dir, dry_run=True)
+
+    assert [task.name for task in tasks] == ["merge:113:A", "merge:113:G"]
+    assert pipeline.plan(tasks) == set()
+
+def test_force_skips_clean_without_raw_files(tmp_path):
+    synthData.generate(tmp_path / "Data", scale=1, cities="A", years=(112, 113), base_rows=20)
+    data_dir = tmp_path / "Data"
+
+    # 只有清理後的表、沒有原始檔時，--force 不可建立注定失敗的清理工作
+    tasks = pipeline.build_graph(data_dir, "A", 112, 113, stages=("scrape", "clean", "aggregate"), force=True,
+                                 cleaned_dir=data_dir / synthData.PEOPLE_DIR, raw_dir=tmp_path / "raw",
+                                 dry_run=True)
+    names = [task.name for task in tasks]
+    assert not [name for name in names if name.startswith("clean:")]
+    to_run = pipeline.plan(tasks, force=True)
+    assert not [name for name in to_run if name.startswith("scrape:")]
+    assert "aggregate:panel" in to_run
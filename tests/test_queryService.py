@@ -0,0 +1,97 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import queryService
+
+ROLLUP = """city,district,date,count,sum,mean,min,max
+A,中山區,11201,2,200,100,90,110
+A,中山區,11301,1,120,120,120,120
+A,大安區,11301,3,600,200,150,250
+"""
+PANEL = """city,district,date,net_migration,population
+A,中山區,11201,-5,1000
+A,中山區,11301,3,1003
+"""
+
+@pytest.fixture
+def server(tmp_path):
+    rollup = tmp_path / "price_rollup.csv"
+    panel = tmp_path / "migration_panel.csv"
+    rollup.write_text(ROLLUP, encoding="utf-8-sig")
+    panel.write_text(PANEL, encoding="utf-8-sig")
+
+    cache = queryService.LRUCache(1024 * 1024)
+    store = queryService.DatasetStore({"price": str(rollup), "population": str(panel)}, cache)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), queryService.make_handler(store, cache))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def test_query_and_cache_hit(server):
+    status, headers, body = get(f"{server}/price?city=A&district=%E4%B8%AD%E5%B1%B1%E5%8D%80&start=113")
+    assert status == 200
+    assert headers["X-Cache"] == "miss"
+    assert [row["date"] for row in json.loads(body)] == ["11301"]
+
+    status, headers, again = get(f"{server}/price?city=A&district=%E4%B8%AD%E5%B1%B1%E5%8D%80&start=113")
+    assert status == 200
+    assert headers["X-Cache"] == "hit"
+    assert again == body
+
+    status, _, body = get(f"{server}/health")
+    assert json.loads(body)["hits"] == 1
+
+def test_csv_format(server):
+    status, headers, body = get(f"{server}/population?city=A&format=csv")
+    assert status == 200
+    assert headers["Content-Type"].startswith("text/csv")
+    assert body.decode("utf-8").splitlines()[0] == "date,district,net_migration,population"
+
+@pytest.mark.parametrize("path, code", [
+    ("/nope", 404),
+    ("/price", 400),
+    ("/price?city=A&start=abc", 400),
+])
+def test_errors(server, path, code):
+    status, headers, body = get(server + path)
+    assert status == code
+    assert headers["Content-Type"].startswith("application/json")
+    assert json.loads(body)["error"]
+
+def test_truncated_rollup_keeps_previous_data(server, tmp_path):
+    url = f"{server}/price?city=A&start=113"
+    status, _, body = get(url)
+    assert status == 200
+
+    # 模擬寫到一半的彙總表：最後一列沒有 date
+    (tmp_path / "price_rollup.csv").write_text(ROLLUP + "A,大安區\n", encoding="utf-8-sig")
+    status, _, again = get(url)
+    assert status == 200
+    assert json.loads(again) == json.loads(body)
+
+def test_load_failure_returns_json_error(server, tmp_path):
+    rollup = tmp_path / "price_rollup.csv"
+    rollup.write_text("city,district\nA,大安區\n", encoding="utf-8-sig")
+    status, headers, body = get(f"{server}/price?city=A")
+    assert status == 500
+    assert json.loads(body)["error"]
+
+    # 來源修好後恢復查詢
+    rollup.write_text(ROLLUP, encoding="utf-8-sig")
+    status, _, body = get(f"{server}/price?city=A")
+    assert status == 200
+    assert len(json.loads(body)) == 3